@@ -0,0 +1,222 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Set
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QPixmap
+
+from storage import ActionStore
+
+
+def action_label(a: Dict[str, Any]) -> str:
+    return f"{a.get('name', '')} [{a.get('type', '')}] — {a.get('param', '')}"
+
+
+class ActionListModel(QAbstractListModel):
+    """List model over an ActionStore.
+
+    Rows are rendered on demand from the store's action dicts, so no per-row widget or item
+    exists. A text filter narrows the visible rows; typing more characters only re-checks the
+    rows that are still visible. All edits go through the store (journaled) and are reported
+    to the view with fine-grained row signals instead of a rebuild.
+
+    With a thumbnails loader (thumbnails.ThumbnailLoader), image rows show a preview of their
+    template. Previews are only requested for rows the view actually paints, and arrive
+    asynchronously; until then (and for write rows) a blank icon keeps row heights uniform.
+    An index from image path to store indices lets an arriving preview update just its rows, and
+    finds the row of an action dict (source_of) without scanning the list.
+    """
+    ActionRole = Qt.UserRole + 1
+
+    def __init__(self, store: ActionStore, parent=None, thumbnails=None):
+        super().__init__(parent)
+        self._store = store
+        self._filter = ""
+        self._rows: List[int] | None = None  # visible store indices, None = no filter
+        self._thumbnails = thumbnails
+        self._blank: QPixmap | None = None
+        self._by_path: Dict[str, Set[int]] = {}
+        self._index_paths()
+        if thumbnails is not None:
+            thumbnails.ready.connect(self._on_thumbnail)
+
+    # --- Qt model interface ----------------------------------------------------------------
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._store.actions) if self._rows is None else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        a = self._store.actions[self.source_row(index.row())]
+        if role == Qt.DisplayRole:
+            return action_label(a)
+        if role == Qt.ToolTipRole:
+            return a.get("param", "")
+        if role == Qt.DecorationRole and self._thumbnails is not None:
+            return self._thumbnail(a)
+        if role == self.ActionRole:
+            return a
+        return None
+
+    def _thumbnail(self, a: Dict[str, Any]) -> QPixmap:
+        if a.get("type", "image") == "image" and a.get("param"):
+            pm = self._thumbnails.get(a["param"])
+            if pm is not None:
+                return pm
+        if self._blank is None:
+            self._blank = QPixmap(self._thumbnails.size, self._thumbnails.size)
+            self._blank.fill(Qt.transparent)
+        return self._blank
+
+    def _on_thumbnail(self, path: str) -> None:
+        for source in sorted(self._by_path.get(path, ())):
+            row = self.view_row(source)
+            if row >= 0:
+                idx = self.index(row)
+                self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
+
+    # --- path index ----------------------------------------------------------------------
+
+    def _index_paths(self) -> None:
+        self._by_path = {}
+        for i, a in enumerate(self._store.actions):
+            self._index_add(a, i)
+
+    def source_of(self, action: Dict[str, Any]) -> int:
+        """Store index of this action dict (by identity), or -1 if it was removed."""
+        actions = self._store.actions
+        for i in self._by_path.get(action.get("param"), ()):
+            if actions[i] is action:
+                return i
+        return -1
+
+    def _index_add(self, a: Dict[str, Any], source: int) -> None:
+        if a.get("param"):
+            self._by_path.setdefault(a["param"], set()).add(source)
+
+    def _index_discard(self, a: Dict[str, Any], source: int) -> None:
+        sources = self._by_path.get(a.get("param"))
+        if sources is not None:
+            sources.discard(source)
+            if not sources:
+                del self._by_path[a["param"]]
+
+    # --- filtering ---------------------------------------------------------------------------
+
+    @property
+    def filtering(self) -> bool:
+        return self._rows is not None
+
+    def source_row(self, row: int) -> int:
+        """Store index of a visible row."""
+        return row if self._rows is None else self._rows[row]
+
+    def view_row(self, source: int) -> int:
+        """Visible row of a store index, or -1 if it is filtered out."""
+        if self._rows is None:
+            return source
+        # visible rows are kept in store order
+        i = bisect_left(self._rows, source)
+        return i if i < len(self._rows) and self._rows[i] == source else -1
+
+    def set_filter(self, text: str) -> None:
+        """Show only actions whose label contains text (case-insensitive)."""
+        text = text.strip().lower()
+        if text == self._filter:
+            return
+        if not text:
+            rows = None
+        elif self._filter and text.startswith(self._filter) and self._rows is not None:
+            # narrowing the previous search: only rows still visible can match
+            rows = self._match_rows(text, self._rows)
+        else:
+            rows = self._match_rows(text)
+        self.beginResetModel()
+        self._filter = text
+        self._rows = rows
+        self.endResetModel()
+
+    def _match_rows(self, text: str, within: List[int] | None = None) -> List[int]:
+        actions = self._store.actions
+        candidates = range(len(actions)) if within is None else within
+        return [i for i in candidates if text in action_label(actions[i]).lower()]
+
+    def _refilter(self) -> None:
+        # store indices shifted; caller wraps this in a model reset
+        if self._filter:
+            self._rows = self._match_rows(self._filter)
+
+    # --- edits (through the store) -------------------------------------------------------
+
+    def append(self, action: Dict[str, Any]) -> None:
+        n = len(self._store.actions)
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), n, n)
+            self._store.add(action)
+            self._index_add(action, n)
+            self.endInsertRows()
+        else:
+            self._store.add(action)
+            self._index_add(action, n)
+            self.beginResetModel()
+            self._refilter()
+            self.endResetModel()
+
+    def remove_rows(self, rows: List[int]) -> None:
+        """Remove visible rows (any order)."""
+        sources = sorted((self.source_row(r) for r in rows), reverse=True)
+        if self._rows is None:
+            for s in sources:
+                self.beginRemoveRows(QModelIndex(), s, s)
+                self._store.remove(s)
+                self.endRemoveRows()
+        else:
+            self.beginResetModel()
+            for s in sources:
+                self._store.remove(s)
+            self._refilter()
+            self.endResetModel()
+        # later store indices all shifted; one rebuild per removal batch
+        self._index_paths()
+
+    def move_rows(self, rows: List[int], delta: int) -> List[int]:
+        """Move the given rows one step up (delta=-1) or down (delta=1) as a group.
+
+        Only allowed without a filter. Returns the new rows of the moved actions.
+        """
+        if self._rows is not None or delta not in (-1, 1):
+            return list(rows)
+        n = len(self._store.actions)
+        selected = set(rows)
+        moved = set()
+        order = sorted(rows) if delta < 0 else sorted(rows, reverse=True)
+        for r in order:
+            dst = r + delta
+            # a row blocked by the edge or by a selected neighbour that couldn't move stays put
+            if dst < 0 or dst >= n or (dst in selected and dst not in moved):
+                continue
+            # Qt's destination row is the index *before* which the row is inserted
+            self.beginMoveRows(QModelIndex(), r, r, QModelIndex(), dst if delta < 0 else dst + 1)
+            actions = self._store.actions
+            self._index_discard(actions[r], r)
+            self._index_discard(actions[dst], dst)
+            self._store.move(r, dst)
+            # a one-step move swaps two neighbours
+            self._index_add(actions[dst], dst)
+            self._index_add(actions[r], r)
+            self.endMoveRows()
+            moved.add(r)
+        return sorted((r + delta) if r in moved else r for r in rows)
+
+    def update_action(self, source: int, **fields) -> None:
+        if "param" in fields:
+            self._index_discard(self._store.actions[source], source)
+        self._store.update(source, **fields)
+        if "param" in fields:
+            self._index_add(self._store.actions[source], source)
+        row = self.view_row(source)
+        if row >= 0:
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx)
@@ -0,0 +1,242 @@
+"""Headless benchmark for image matching and sequence execution.
+
+Runs against generated screens served by the synthetic capture backend, with pyautogui and
+pyperclip replaced by stubs (stubs.py) so nothing is clicked, typed or copied. Results are
+printed as JSON (or written with --out) and can be compared with an earlier run via --compare.
+
+    python bench.py --out bench.json
+    python bench.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# nothing may be clicked or typed; must happen before mouse/button are imported
+from stubs import stub_input
+
+stub_input()
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from capture import SharedCapture, SyntheticBackend  # noqa: E402
+from matcher import locate_near, match_memo, tiled_matcher  # noqa: E402
+from mouse import MouseController  # noqa: E402
+from plan import compile_plan  # noqa: E402
+from templates import TemplateCache  # noqa: E402
+
+SCREENS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+TEMPLATES = (32, 96, 200)
+
+
+def make_screen(w: int, h: int, seed: int) -> np.ndarray:
+    """A UI-like test screen: smooth background with random flat boxes and noise."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (max(1, h // 40), max(1, w // 40), 3), dtype=np.uint8)
+    img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(60):
+        x, y = int(rng.integers(0, w - 20)), int(rng.integers(0, h - 20))
+        bw, bh = int(rng.integers(20, 240)), int(rng.integers(12, 90))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x, y), (x + bw, y + bh), color, -1)
+        cv2.putText(img, "btn%d" % x, (x + 4, y + 14), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+    noise = rng.integers(0, 6, img.shape, dtype=np.uint8)
+    return cv2.add(img, noise)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {}
+    arr = np.asarray(samples) * 1000.0
+    return {
+        "n": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p90": round(float(np.percentile(arr, 90)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def bench_image(screen_name: str, tsize: int, method: str, use_hint: bool, iterations: int,
+                workdir: str) -> Dict[str, Any]:
+    """Capture, match and image_click latency for one screen/template/method combination."""
+    w, h = SCREENS[screen_name]
+    screen = make_screen(w, h, seed=w + tsize)
+    x, y = w * 3 // 5, h * 2 // 5
+    path = os.path.join(workdir, f"tpl_{screen_name}_{tsize}.png")
+    cv2.imwrite(path, screen[y:y + tsize, x:x + tsize])
+    cache = TemplateCache()
+    tpl = cache.get(path)
+    cap = SharedCapture(backend=SyntheticBackend([screen]))
+    MouseController.capture = cap
+    hint = [x, y] if use_hint else None
+
+    capture_t, match_t, e2e_t = [], [], []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        frame = cap.refresh()
+        t1 = time.perf_counter()
+        m = locate_near(tpl, frame, hint, method=method)
+        t2 = time.perf_counter()
+        capture_t.append(t1 - t0)
+        match_t.append(t2 - t1)
+        if m is None or (m.left, m.top) != (x, y):
+            raise RuntimeError(f"benchmark target not found correctly: {m}")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cap.invalidate()
+        # measure matching itself, not the unchanged-screen shortcut (see bench_unchanged)
+        match_memo.clear()
+        t0 = time.perf_counter()
+        MouseController.template_click(tpl, hint=hint, method=method, duration=0)
+        e2e_t.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": f"image/{screen_name}/{tsize}px/{method}{'/hint' if use_hint else ''}",
+        "capture_ms": percentiles(capture_t),
+        "match_ms": percentiles(match_t),
+        "e2e_ms": percentiles(e2e_t),
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def bench_sequence(screen_name: str, steps: int, iterations: int, workdir: str) -> Dict[str, Any]:
+    """End-to-end latency of a compiled plan alternating image and write actions."""
+    w, h = SCREENS[screen_name]
+    screen = make_screen(w, h, seed=7)
+    actions = []
+    for i in range(steps):
+        if i % 2 == 0:
+            x, y = (w // (steps + 1)) * (i + 1) % (w - 80), (h // 3 + 37 * i) % (h - 60)
+            path = os.path.join(workdir, f"seq_{screen_name}_{i}.png")
+            cv2.imwrite(path, screen[y:y + 60, x:x + 80])
+            actions.append({"name": f"img{i}", "type": "image", "param": path, "delay": 0})
+        else:
+            actions.append({"name": f"txt{i}", "type": "write", "param": "benchmark", "delay": 0})
+    MouseController.capture = SharedCapture(backend=SyntheticBackend([screen]))
+    plan = compile_plan(actions, cache=TemplateCache())
+
+    runs = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        match_memo.clear()
+        t0 = time.perf_counter()
+        plan.run(MouseController)
+        runs.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": f"sequence/{screen_name}/{steps}steps",
+        "e2e_ms": percentiles(runs),
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed > 0 else None,
+        "actions_per_s": round(iterations * steps / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def bench_unchanged(screen_name: str, iterations: int, workdir: str) -> Dict[str, Any]:
+    """image_click latency on a screen that doesn't change between clicks (change check skips matching)."""
+    w, h = SCREENS[screen_name]
+    screen = make_screen(w, h, seed=11)
+    path = os.path.join(workdir, f"static_{screen_name}.png")
+    cv2.imwrite(path, screen[h // 2:h // 2 + 48, w // 3:w // 3 + 48])
+    tpl = TemplateCache().get(path)
+    MouseController.capture = SharedCapture(backend=SyntheticBackend([screen]))
+    match_memo.clear()
+    before = match_memo.stats()
+    runs = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        MouseController.template_click(tpl, duration=0, memo=True)
+        runs.append(time.perf_counter() - t0)
+    after = match_memo.stats()
+    lookups = after["lookups"] - before["lookups"]
+    return {
+        "name": f"unchanged/{screen_name}",
+        "e2e_ms": percentiles(runs),
+        "skip_rate": round((after["skips"] - before["skips"]) / lookups, 3) if lookups else 0.0,
+    }
+
+
+def run_all(screens: List[str], iterations: int, quick: bool) -> Dict[str, Any]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aaa_bench_") as workdir:
+        for s in screens:
+            for tsize in (TEMPLATES[1:2] if quick else TEMPLATES):
+                for method in ("template", "pyramid"):
+                    results.append(bench_image(s, tsize, method, False, iterations, workdir))
+                results.append(bench_image(s, tsize, "template", True, iterations, workdir))
+            results.append(bench_sequence(s, 6, iterations, workdir))
+            results.append(bench_unchanged(s, iterations, workdir))
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "iterations": iterations,
+            "match_threads": tiled_matcher.threads,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing the change in p50/p95 end-to-end latency per scenario."""
+    old = {r["name"]: r for r in baseline.get("results", [])}
+    lines = []
+    for r in current["results"]:
+        o = old.get(r["name"])
+        if not o:
+            lines.append(f"{r['name']}: new")
+            continue
+        parts = []
+        for key in ("p50", "p95"):
+            a, b = o["e2e_ms"].get(key), r["e2e_ms"].get(key)
+            if a:
+                parts.append(f"{key} {a:.2f} -> {b:.2f} ms ({(b - a) / a * 100:+.1f}%)")
+        lines.append(f"{r['name']}: " + ", ".join(parts))
+    return lines
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark image matching and sequence execution (headless).")
+    ap.add_argument("--screens", default="720p,1080p,4k", help="comma separated: " + ",".join(SCREENS))
+    ap.add_argument("-n", "--iterations", type=int, default=30)
+    ap.add_argument("--quick", action="store_true", help="one template size per screen")
+    ap.add_argument("--out", help="write JSON results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--threads", type=int, help="match threads for tiled full frame searches (1 = off)")
+    args = ap.parse_args(argv)
+    if args.threads is not None:
+        tiled_matcher.set_threads(args.threads)
+
+    screens = [s.strip() for s in args.screens.split(",") if s.strip()]
+    unknown = [s for s in screens if s not in SCREENS]
+    if unknown:
+        ap.error(f"unknown screen(s): {', '.join(unknown)}")
+
+    data = run_all(screens, args.iterations, args.quick)
+    text = json.dumps(data, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        for line in compare(data, baseline):
+            print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+from lazy import cv2, np
+
+from templates import decode_image
+
+BUNDLE_SUFFIX = ".templates"
+MAGIC = b"AAATPL1\0"
+ALIGN = 64
+
+# (abs path, mtime_ns, size) -> sha1 of the file, so unchanged images are not re-hashed
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def bundle_path(actions_path: str) -> str:
+    return actions_path + BUNDLE_SUFFIX
+
+
+def file_sha1(path: str) -> str:
+    """Content hash of an image file (cached by path, mtime and size)."""
+    ap = os.path.abspath(path)
+    st = os.stat(ap)
+    key = (ap, st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+    if digest is None:
+        with open(ap, "rb") as fh:
+            digest = hashlib.sha1(fh.read()).hexdigest()
+        with _hash_lock:
+            _hash_cache[key] = digest
+    return digest
+
+
+def _image_paths(actions: Iterable[Dict[str, Any]]) -> List[str]:
+    seen = []
+    for a in actions:
+        p = a.get("param")
+        if a.get("type", "image") == "image" and p and os.path.exists(p):
+            ap = os.path.abspath(p)
+            if ap not in seen:
+                seen.append(ap)
+    return seen
+
+
+def _read_index(data_path: str) -> Dict[str, Any] | None:
+    """The JSON index of a bundle data file, read without mapping it. None if it isn't a bundle."""
+    try:
+        with open(data_path, "rb") as fh:
+            head = fh.read(len(MAGIC) + 4)
+            if len(head) < len(MAGIC) + 4 or head[:len(MAGIC)] != MAGIC:
+                return None
+            (n,) = struct.unpack("<I", head[len(MAGIC):])
+            return json.loads(fh.read(n).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _current(path: str) -> Tuple[str, Dict[str, Any]] | None:
+    """(data file, index) of the bundle that path currently points to, or None."""
+    try:
+        with open(path, "rb") as fh:
+            raw = fh.read(4096)
+    except OSError:
+        return None
+    try:
+        name = json.loads(raw.decode("utf-8"))["file"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    data_path = os.path.join(os.path.dirname(path), os.path.basename(name))
+    index = _read_index(data_path)
+    return None if index is None else (data_path, index)
+
+
+class TemplateBundle:
+    """Pre-decoded templates packed into one file and memory-mapped read-only.
+
+    path is a small pointer file naming the current data file (<path>.<hash>). Data files are
+    never rewritten in place: a save writes a new one and then switches the pointer, because a
+    mapped file cannot be replaced on Windows. Data layout: MAGIC, a uint32 index length, a
+    JSON index, then the raw color and gray arrays, each aligned to ALIGN bytes. Every entry
+    records the sha1 of the image file it was decoded from; get() only serves an entry while
+    the file still has that content. Processes mapping the same bundle share its pages.
+    """
+    def __init__(self, path: str, data_path: str, entries: Dict[str, Dict[str, Any]], data):
+        self.path = path
+        self.data_path = data_path
+        self.entries = entries
+        self._data = data
+
+    @classmethod
+    def open(cls, path: str) -> TemplateBundle | None:
+        """Map the bundle path points to. Returns None if it is missing or not a valid bundle."""
+        current = _current(path)
+        if current is None:
+            return None
+        data_path, index = current
+        try:
+            data = np.memmap(data_path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Ignoring template bundle {data_path}: {e}")
+            return None
+        return cls(path, data_path, {e["path"]: e for e in index["entries"]}, data)
+
+    def _array(self, offset: int, shape: List[int]):
+        count = int(np.prod(shape))
+        return self._data[offset:offset + count].reshape(shape)
+
+    def get(self, path: str):
+        """(color, gray) arrays for an image file, or None if it isn't bundled or has changed."""
+        ap = os.path.abspath(path)
+        e = self.entries.get(ap)
+        if e is None:
+            return None
+        try:
+            if file_sha1(ap) != e["sha1"]:
+                return None
+        except OSError:
+            return None
+        shape = e["shape"]
+        return self._array(e["color"], shape), self._array(e["gray"], shape[:2])
+
+    def digests(self) -> Dict[str, str]:
+        return {p: e["sha1"] for p, e in self.entries.items()}
+
+
+def _atomic(path: str, write) -> None:
+    d = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=d or ".", prefix=".tmp_templates_")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def _remove_stale(path: str, keep: str | None) -> None:
+    # old data files; one still mapped by some process (Windows) is left for a later save
+    d = os.path.dirname(path) or "."
+    prefix = os.path.basename(path) + "."
+    for name in os.listdir(d):
+        full = os.path.join(d, name)
+        if name.startswith(prefix) and len(name) == len(prefix) + 12 and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def write_bundle(actions: Iterable[Dict[str, Any]], path: str) -> bool:
+    """Pack the images referenced by image actions into a new data file and point path at it.
+
+    Nothing is written if the current bundle already holds exactly these files with the same
+    content. Open bundles (in any process) keep working on their old data file. Returns True
+    if a new bundle was written.
+    """
+    paths = _image_paths(actions)
+    digests = {p: file_sha1(p) for p in paths}
+    current = _current(path)
+    if current is not None and {e["path"]: e["sha1"] for e in current[1]["entries"]} == digests:
+        return False
+    if not paths:
+        if os.path.exists(path):
+            os.remove(path)
+        _remove_stale(path, None)
+        return False
+
+    entries = []
+    arrays = []
+    offset = 0
+    for p in paths:
+        color = decode_image(p)
+        gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+        entry = {"path": p, "sha1": digests[p], "shape": list(color.shape)}
+        for name, arr in (("color", color), ("gray", gray)):
+            offset = -(-offset // ALIGN) * ALIGN
+            entry[name] = offset  # relative to the data start for now
+            arrays.append((offset, arr))
+            offset += arr.nbytes
+        entries.append(entry)
+
+    # the index size depends on the offsets, so place the data after a padded header
+    def header_for(base: int) -> bytes:
+        index = {"entries": [{**e, "color": e["color"] + base, "gray": e["gray"] + base} for e in entries]}
+        raw = json.dumps(index).encode("utf-8")
+        return MAGIC + struct.pack("<I", len(raw)) + raw
+
+    base = 0
+    header = header_for(base)
+    while len(header) > base:
+        base = -(-len(header) // ALIGN) * ALIGN
+        header = header_for(base)
+
+    def write_data(fh) -> None:
+        fh.write(header)
+        fh.write(b"\0" * (base - len(header)))
+        pos = base
+        for off, arr in arrays:
+            fh.write(b"\0" * (base + off - pos))
+            fh.write(np.ascontiguousarray(arr).tobytes())
+            pos = base + off + arr.nbytes
+
+    # the header holds every image's sha1, so equal headers mean equal files
+    data_path = f"{path}.{hashlib.sha1(header).hexdigest()[:12]}"
+    if _read_index(data_path) is None:
+        _atomic(data_path, write_data)
+    pointer = json.dumps({"file": os.path.basename(data_path)}).encode("utf-8")
+    _atomic(path, lambda fh: fh.write(pointer))
+    _remove_stale(path, data_path)
+    return True
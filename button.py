@@ -1,42 +1,46 @@
 import sys
 import time
 import threading
+import itertools
 import math
 
-import pyautogui as pyg
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QPushButton, QVBoxLayout
+    QApplication, QWidget, QPushButton, QVBoxLayout, QMenu, QFileDialog
 )
-from PySide6.QtCore import Qt, QEvent
-
-pyg.FAILSAFE = True
-
-class MouseController:
-    """A class to control mouse actions using pyautogui."""
-    @staticmethod
-    def move_to(x: int, y: int, duration: float = 0.4) -> None:
-        """Move the mouse to a specific (x, y) position."""
-        pyg.moveTo(x, y, duration=duration)
-    
-    @staticmethod
-    def click(x: int, y: int, button: str = 'left', duration: float = 0.4) -> None:
-        """Click at a specific (x, y) position, with specified button."""
-        if button not in ['left', 'right', 'middle']:
-            raise ValueError("Button must be 'left', 'right', or 'middle'")
-        pyg.click(x, y, button=button, duration=duration)
-        
-    @staticmethod
-    def image_click(img_pth: str, confidence: float = 0.7, duration: float = 0.4) -> None:
-        """Find an image on the screen and click it."""
-        location = pyg.locateCenterOnScreen(img_pth, confidence=confidence)
-        if location:
-            x, y = location
-            pyg.click(x, y, duration=duration)
-        else:
-            print(f"Image {img_pth} not found on screen.")
+from PySide6.QtCore import Qt, QEvent, Signal
+
+from mouse import MouseController
+from plan import CancelToken, ImageStep, Plan, RunCancelled, compile_plan
+from templates import Template, template_cache
+from matcher import match_memo
+from triggers import Trigger, trigger_loop
+from tracing import RunStats
+from loop import LoopSpec, LoopStats, run_loop
+from motion import PROFILES, get_profile
 
 class FloatingButton(QWidget):
     """A small draggable circular floating button (blue) with arc options to the right."""
+    # (source action dict, [left, top]) when an image action is found somewhere new
+    last_hit_changed = Signal(object, list)
+    # emitted from the run thread after each completed run (duration in seconds)
+    run_timed = Signal(float)
+    # emitted from the run thread when a loop ends (LoopStats.summary())
+    loop_finished = Signal(str)
+    # emitted from the trigger loop thread when the armed image appears (trigger name)
+    triggered = Signal(str)
+
+    # repeat presets offered in the right-click menu: label -> LoopSpec kwargs (None = single run)
+    LOOP_PRESETS = {
+        "Once": None,
+        "10×": {"count": 10},
+        "100×": {"count": 100},
+        "1000×": {"count": 1000},
+        "For 1 minute": {"duration": 60},
+        "For 10 minutes": {"duration": 600},
+        "Until stopped": {},
+    }
+    RATE_PRESETS = (None, 0.5, 1, 2, 5, 10)
+
     def __init__(self, diameter: int = 50, initial_pos: tuple | None = None):
         super().__init__()
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
@@ -48,7 +52,7 @@ class FloatingButton(QWidget):
         self.spacing = 6
 
         self.opt_dist = int(self.diameter * 1.6)
-        self.opt_angles = (-45, 45)
+        self.opt_angles = (-45, 0, 45)
         self._base_margin = 8
 
         self.collapsed_size = (diameter, diameter)
@@ -77,6 +81,9 @@ class FloatingButton(QWidget):
         self.main_btn.setCursor(Qt.PointingHandCursor)
         self.main_btn.clicked.connect(self.toggle_options)
         self.main_btn.installEventFilter(self)
+        # right click: motion profile, repeat mode and image trigger for this button's runs
+        self.main_btn.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.main_btn.customContextMenuRequested.connect(self._show_run_menu)
 
         opt_radius = self.opt_size // 2
         self.start_btn = QPushButton(" ▶ ", self)
@@ -99,7 +106,30 @@ class FloatingButton(QWidget):
         )
         self.start_btn.setVisible(False)
         self.start_btn.setFocusPolicy(Qt.NoFocus)
-        self.start_btn.clicked.connect(lambda: threading.Thread(target=self.perform_mouse_action, daemon=True).start())
+        self.start_btn.clicked.connect(self.start)
+
+        self.stop_btn = QPushButton(" ■ ", self)
+        self.stop_btn.setFixedSize(self.opt_size, self.opt_size)
+        self.stop_btn.setStyleSheet(
+            f"""
+            QPushButton {{
+                background-color: #6c757d;
+                border-radius: {opt_radius}px;
+                color: white;
+                font-size: 14px;
+                font-weight: bold;
+                margin: 0px;
+                padding: 0px;
+                border: none;
+            }}
+            QPushButton:hover {{ background-color: #5a6268; }}
+            QPushButton:pressed {{ background-color: #494f54; padding-top: 2px; }}
+            """
+        )
+        self.stop_btn.setToolTip("Stop")
+        self.stop_btn.setVisible(False)
+        self.stop_btn.setFocusPolicy(Qt.NoFocus)
+        self.stop_btn.clicked.connect(self.stop)
 
         self.exit_btn = QPushButton(" ✖ ", self)
         self.exit_btn.setFixedSize(self.opt_size, self.opt_size)
@@ -131,6 +161,29 @@ class FloatingButton(QWidget):
         self._options_visible = False
         self._offset = (0, 0)
 
+        # shared ActionExecutor (set by the manager window); without one, runs use a plain thread
+        self.executor = None
+        # what Start does while a run is active: "reject", "queue" or "preempt"
+        self.overlap_policy = "reject"
+        self._cancel = None
+        self.start_btn.setToolTip("Start")
+
+        # per-action traces go to trace_writer (tracing.TraceWriter) when set
+        self.trace_writer = None
+        # motion profile name for image steps that don't set their own (None = default)
+        self.motion: str | None = None
+        self.stats = RunStats()
+        self._run_ids = itertools.count(1)
+        self.run_timed.connect(self._update_stats_tooltip)
+        # repeat Start's run as described by loop (None = run once); the plan, its templates and
+        # the capture backend stay loaded across iterations
+        self.loop: LoopSpec | None = None
+        self.loop_finished.connect(self._show_loop_summary)
+        # armed "when image appears" condition (see triggers.trigger_loop)
+        self.trigger: Trigger | None = None
+        self.triggered.connect(self._on_triggered)
+        self.main_btn.setToolTip("No runs yet")
+
         self._relayout()
         if initial_pos:
             self.move(*initial_pos)
@@ -162,7 +215,7 @@ class FloatingButton(QWidget):
         main_y = int(oy + cy - self.diameter / 2)
         self.main_btn.move(main_x, main_y)
 
-        for btn, ang in ((self.start_btn, self.opt_angles[0]), (self.exit_btn, self.opt_angles[1])):
+        for btn, ang in zip((self.start_btn, self.stop_btn, self.exit_btn), self.opt_angles):
             rad = math.radians(ang)
             bx = ox + cx + math.cos(rad) * self.opt_dist - self.opt_size / 2
             by = oy + cy + math.sin(rad) * self.opt_dist - self.opt_size / 2
@@ -209,6 +262,7 @@ class FloatingButton(QWidget):
             self.move(old_pos.x() + dx, old_pos.y() + dy)
             self.setFixedSize(w, h)
             self.start_btn.setVisible(True)
+            self.stop_btn.setVisible(True)
             self.exit_btn.setVisible(True)
             self._offset = (ox, oy)
         else:
@@ -218,6 +272,7 @@ class FloatingButton(QWidget):
             self.move(old_pos.x() + dx, old_pos.y() + dy)
             self.setFixedSize(*self.collapsed_size)
             self.start_btn.setVisible(False)
+            self.stop_btn.setVisible(False)
             self.exit_btn.setVisible(False)
             self._offset = (ox, oy)
 
@@ -237,40 +292,224 @@ class FloatingButton(QWidget):
         self._drag_offset = None
         event.accept()
 
-    def perform_mouse_action(self):
-        """Entrypoint dijalankan oleh Start. Jika ada self.action_sequence -> jalankan berurutan."""
+    def set_executor(self, executor) -> None:
+        """Run sequences on a shared ActionExecutor (or ProcessExecutor) and follow its run state."""
+        self.executor = executor
+        executor.state_changed.connect(self._on_run_state)
+        if getattr(executor, "out_of_process", False):
+            executor.progress.connect(self._on_worker_step)
+            executor.hit.connect(self._on_worker_hit)
+            executor.timed.connect(self._on_worker_timed)
+            executor.traces.connect(self._on_worker_traces)
+            executor.loop_finished.connect(self._on_worker_loop)
+
+    def start(self):
+        """Start button: submit a run to the executor, or fall back to a daemon thread."""
+        seq = getattr(self, "action_sequence", None)
+        if getattr(self.executor, "out_of_process", False) and seq:
+            loop = self.loop and {"count": self.loop.count, "duration": self.loop.duration, "rate": self.loop.rate}
+            self.executor.submit(self, {"actions": seq, "motion": self.motion, "loop": loop,
+                                        "trace": self.trace_writer is not None}, policy=self.overlap_policy)
+            return
+        if self.executor is not None:
+            self.executor.submit(self, self.perform_mouse_action, policy=self.overlap_policy)
+            return
+        if self._cancel is not None and not self._cancel.is_set():
+            print("Sequence already running")
+            return
+        token = CancelToken()
+        self._cancel = token
+        threading.Thread(target=self._run_detached, args=(token,), daemon=True).start()
+
+    def _run_detached(self, token: CancelToken):
+        try:
+            self.perform_mouse_action(token)
+        except RunCancelled:
+            print("Sequence stopped")
+
+    def stop(self):
+        """Stop button: cancel the running sequence (and anything queued)."""
+        if self.executor is not None:
+            self.executor.cancel(self)
+        elif self._cancel is not None:
+            self._cancel.set()
+
+    def _on_run_state(self, owner, run_id: int, state: str):
+        if owner is not self:
+            return
+        self.start_btn.setToolTip(f"Start (last run #{run_id}: {state})")
+
+    def _on_worker_step(self, owner, index: int, name: str):
+        if owner is self:
+            self.start_btn.setToolTip(f"Running step {index + 1}: {name}")
+
+    def _on_worker_hit(self, owner, index: int, hit: list):
+        if owner is self:
+            self._on_hit(index, hit)
+
+    def _on_worker_timed(self, owner, duration: float):
+        if owner is self:
+            self.stats.add(duration)
+            self._update_stats_tooltip(duration)
+
+    def _on_worker_traces(self, owner, records: list):
+        if owner is self and self.trace_writer is not None:
+            self.trace_writer.write(records)
+
+    def _on_worker_loop(self, owner, summary: str):
+        if owner is self:
+            self.loop_finished.emit(summary)
+
+    def set_plan(self, plan: Plan, source_actions=None) -> None:
+        """Bind a compiled plan. source_actions are the stored action dicts it was compiled from."""
+        self.plan = plan
+        self.source_actions = source_actions
+
+    def _on_hit(self, index: int, hit: list):
+        src = getattr(self, "source_actions", None)
+        if src and index < len(src):
+            self.last_hit_changed.emit(src[index], hit)
+
+    def perform_mouse_action(self, token: CancelToken | None = None):
+        """Entrypoint dijalankan oleh Start. Jika ada self.plan / self.action_sequence -> jalankan berurutan."""
+        plan = getattr(self, "plan", None)
         seq = getattr(self, "action_sequence", None)
-        if seq:
-            self.run_actions(seq)
+        if plan is None and seq:
+            plan = self.plan = compile_plan(seq)
+        if plan is not None:
+            if self.loop is None:
+                self._run_traced(plan, token)
+            else:
+                self._run_loop(plan, token)
             return
 
         try:
             MouseController.image_click("./msg.png")
             time.sleep(0.5)
-            pyg.write("Hello, World!", interval=0.1)
-            pyg.press("enter")
+            MouseController.write_text("Hello, World!", interval=0.1)
         except Exception as e:
             print("Mouse action error:", e)
 
-    def run_actions(self, actions):
-        """Run a list of action dicts in order. action = {'type': 'image'|'write', 'param': ...}."""
-        for a in actions:
+    def run_actions(self, actions, token: CancelToken | None = None):
+        """Compile a list of action dicts and run it. action = {'type': 'image'|'write', 'param': ...}.
+
+        token cancels the run between actions, during image waits and during pauses.
+        """
+        self._run_traced(compile_plan(actions), token)
+
+    def _run_traced(self, plan: Plan, token: CancelToken | None):
+        """Run a plan, record its duration in self.stats and write per-action traces."""
+        traces = [] if self.trace_writer is not None else None
+        t0 = time.perf_counter()
+        try:
+            plan.run(MouseController, token, on_hit=self._on_hit, traces=traces, run_id=next(self._run_ids),
+                     motion=get_profile(self.motion))
+        except RunCancelled:
+            raise
+        else:
+            duration = time.perf_counter() - t0
+            self.stats.add(duration)
+            self.run_timed.emit(duration)
+        finally:
+            if traces:
+                self.trace_writer.write([t.to_dict() for t in traces])
+
+    def _run_loop(self, plan: Plan, token: CancelToken | None):
+        """Repeat a plan per self.loop on this thread; each iteration is traced like a single run."""
+        token = token or CancelToken()
+        stats = LoopStats()
+        try:
+            run_loop(lambda _i: self._run_traced(plan, token), self.loop, token, stats=stats)
+        finally:
+            self.loop_finished.emit(stats.summary())
+
+    def _set_loop(self, count=None, duration=None, rate=None, once=False):
+        self.loop = None if once else LoopSpec(count, duration, rate)
+
+    def _show_run_menu(self, pos):
+        menu = QMenu(self)
+        menu.addSection("Mouse motion")
+        for name in [None, *PROFILES]:
+            act = menu.addAction(name or "per action")
+            act.setCheckable(True)
+            act.setChecked(self.motion == name)
+            act.triggered.connect(lambda _=False, n=name: setattr(self, "motion", n))
+
+        menu.addSection("Repeat")
+        loop = self.loop
+        rate = loop.rate if loop is not None else None
+        for label, preset in self.LOOP_PRESETS.items():
+            act = menu.addAction(label)
+            act.setCheckable(True)
+            if preset is None:
+                act.setChecked(loop is None)
+                act.triggered.connect(lambda _=False: self._set_loop(once=True))
+            else:
+                act.setChecked(loop is not None and loop.count == preset.get("count")
+                               and loop.duration == preset.get("duration"))
+                act.triggered.connect(lambda _=False, p=preset: self._set_loop(rate=rate, **p))
+
+        rate_menu = menu.addMenu("Rate")
+        rate_menu.setEnabled(loop is not None)
+        for r in self.RATE_PRESETS:
+            act = rate_menu.addAction(f"{r:g} / s" if r else "as fast as possible")
+            act.setCheckable(True)
+            act.setChecked(rate == r)
+            if loop is not None:
+                act.triggered.connect(lambda _=False, r=r: self._set_loop(loop.count, loop.duration, r))
+
+        menu.addSection("Run when image appears")
+        off = menu.addAction("Off")
+        off.setCheckable(True)
+        off.setChecked(self.trigger is None)
+        off.triggered.connect(lambda _=False: self.disarm())
+        plan = getattr(self, "plan", None)
+        for step in (plan.steps if plan is not None else ()):
+            if not isinstance(step, ImageStep):
+                continue
+            act = menu.addAction(step.name)
+            act.setCheckable(True)
+            act.setChecked(self.trigger is not None and self.trigger.template is step.template)
+            act.triggered.connect(lambda _=False, s=step: self.arm(s.template, s.name, s.confidence, s.scales,
+                                                                   s.method, s.levels))
+        menu.addAction("Other image…").triggered.connect(lambda _=False: self._arm_from_file())
+        menu.exec(self.main_btn.mapToGlobal(pos))
+
+    def arm(self, template: Template, name: str | None = None, confidence: float = 0.8, scales=None,
+            method: str = "template", levels: int = 2) -> None:
+        """Press Start automatically whenever template appears on screen (matched with method)."""
+        self.disarm()
+        self.trigger = trigger_loop.arm(Trigger(
+            name or template.path, template, lambda t, m: self.triggered.emit(t.name),
+            confidence=confidence, scales=scales, method=method, levels=levels,
+        ))
+        self.main_btn.setText(" ⚡ ")
+        self.start_btn.setToolTip(f"Start (armed: runs when {self.trigger.name} appears)")
+
+    def disarm(self) -> None:
+        if self.trigger is not None:
+            trigger_loop.disarm(self.trigger)
+            self.trigger = None
+            self.main_btn.setText(" ⚙︎ ")
+            self.start_btn.setToolTip("Start")
+
+    def _on_triggered(self, name: str):
+        if self.trigger is not None and self.trigger.name == name:
+            self.start()
+
+    def _arm_from_file(self):
+        p, _ = QFileDialog.getOpenFileName(self, "Run when this image appears", "", "Images (*.png *.jpg *.bmp *.gif)")
+        if p:
             try:
-                a_type = a.get("type", "image")
-                param = a.get("param", "")
-                if a_type == "image":
-                    if param:
-                        MouseController.image_click(param)
-                    else:
-                        print("Skipping image action with empty param")
-                elif a_type == "write":
-                    if param:
-                        pyg.write(param, interval=0.2)
-                        pyg.press("enter")
-                    else:
-                        print("Skipping write action with empty param")
-                else:
-                    print("Unknown action type:", a_type)
-                time.sleep(0.35)
+                self.arm(template_cache.get(p))
             except Exception as e:
-                print("Error running action:", e)
\ No newline at end of file
+                print("Could not arm trigger:", e)
+
+    def _show_loop_summary(self, summary: str):
+        self.start_btn.setToolTip(f"Start ({self.loop.describe() if self.loop else 'once'}) · last loop: {summary}")
+
+    def _update_stats_tooltip(self, duration: float):
+        p95 = self.stats.percentile(95)
+        skip_rate = match_memo.stats()["skip_rate"]
+        self.main_btn.setToolTip(f"Last run: {duration:.2f}s · p95: {p95:.2f}s ({len(self.stats)} runs)\n"
+                                 f"Matches skipped on unchanged screen: {skip_rate:.0%}")
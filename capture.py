@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from lazy import cv2, np
+
+from templates import downscale
+
+
+class Frame:
+    """A captured screen image (BGR) plus its position on the virtual desktop."""
+    __slots__ = ("image", "left", "top", "ts", "_gray", "_levels", "_features")
+
+    def __init__(self, image: np.ndarray, left: int = 0, top: int = 0, ts: float | None = None):
+        self.image = image
+        self.left = left
+        self.top = top
+        self.ts = time.monotonic() if ts is None else ts
+        self._gray = None
+        self._levels: Dict[tuple, np.ndarray] = {}
+        # keypoints per feature method (see features.frame_features)
+        self._features: Dict[str, Any] = {}
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale version of the frame, computed once and shared by all matches on this frame."""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def size(self) -> tuple:
+        h, w = self.image.shape[:2]
+        return w, h
+
+    def level(self, level: int, grayscale: bool = False) -> np.ndarray:
+        """Frame downscaled by 2**level, computed once and shared by all pyramid matches."""
+        src = self.gray if grayscale else self.image
+        if level <= 0:
+            return src
+        arr = self._levels.get((level, grayscale))
+        if arr is None:
+            arr = downscale(src, level)
+            self._levels[(level, grayscale)] = arr
+        return arr
+
+
+Region = Tuple[int, int, int, int]  # left, top, width, height in desktop coordinates
+
+
+class CaptureBackend:
+    """Interface for screen capture backends. grab() returns a BGR Frame."""
+    name = "base"
+
+    def grab(self, region: Region | None = None) -> Frame:
+        """Capture region (or the whole virtual desktop when None)."""
+        raise NotImplementedError
+
+    def monitors(self) -> List[Region]:
+        """Regions of the physical monitors, primary first."""
+        raise NotImplementedError
+
+    def grab_monitor(self, index: int = 0) -> Frame:
+        """Capture a single monitor by index into monitors()."""
+        return self.grab(self.monitors()[index])
+
+    def close(self) -> None:
+        pass
+
+
+class PyscreezeBackend(CaptureBackend):
+    """Capture through pyautogui/pyscreeze (may use scrot and a temp file on Linux)."""
+    name = "pyscreeze"
+
+    def grab(self, region: Region | None = None) -> Frame:
+        import pyautogui as pyg  # needs a display; only imported when this backend is used
+        img = pyg.screenshot(region=tuple(region) if region else None)
+        arr = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        left, top = (region[0], region[1]) if region else (0, 0)
+        return Frame(arr, left, top)
+
+    def monitors(self) -> List[Region]:
+        import pyautogui as pyg
+        w, h = pyg.size()
+        return [(0, 0, w, h)]
+
+
+class MssBackend(CaptureBackend):
+    """Capture with mss straight into memory (no temp files). One mss handle per thread."""
+    name = "mss"
+
+    def __init__(self):
+        import mss  # optional dependency
+        self._mss = mss
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def grab(self, region: Region | None = None) -> Frame:
+        sct = self._sct()
+        if region is None:
+            mon = sct.monitors[0]  # all monitors combined
+        else:
+            left, top, w, h = region
+            mon = {"left": int(left), "top": int(top), "width": int(w), "height": int(h)}
+        shot = sct.grab(mon)
+        arr = cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+        return Frame(arr, mon["left"], mon["top"])
+
+    def monitors(self) -> List[Region]:
+        return [(m["left"], m["top"], m["width"], m["height"]) for m in self._sct().monitors[1:]]
+
+    def close(self) -> None:
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class SyntheticBackend(CaptureBackend):
+    """Serves pre-supplied BGR frames from memory, for tests and benchmarks without a display.
+
+    Frames are returned in order; the last one repeats once the list is exhausted
+    (or the list cycles when loop=True).
+    """
+    name = "synthetic"
+
+    def __init__(self, frames: Sequence[np.ndarray] = (), origin: Tuple[int, int] = (0, 0), loop: bool = False):
+        self.frames: List[np.ndarray] = list(frames)
+        self.origin = origin
+        self.loop = loop
+        self._pos = 0
+        self._lock = threading.Lock()
+
+    def push(self, image: np.ndarray) -> None:
+        with self._lock:
+            self.frames.append(image)
+
+    def _next(self) -> np.ndarray:
+        with self._lock:
+            if not self.frames:
+                raise RuntimeError("SyntheticBackend has no frames")
+            img = self.frames[min(self._pos, len(self.frames) - 1)]
+            self._pos += 1
+            if self.loop and self._pos >= len(self.frames):
+                self._pos = 0
+            return img
+
+    def grab(self, region: Region | None = None) -> Frame:
+        img = self._next()
+        ox, oy = self.origin
+        if region is None:
+            return Frame(img, ox, oy)
+        left, top, w, h = (int(v) for v in region)
+        x0, y0 = max(0, left - ox), max(0, top - oy)
+        crop = img[y0:max(y0, top - oy + h), x0:max(x0, left - ox + w)]
+        return Frame(crop, ox + x0, oy + y0)
+
+    def monitors(self) -> List[Region]:
+        h, w = self.frames[0].shape[:2] if self.frames else (0, 0)
+        return [(self.origin[0], self.origin[1], w, h)]
+
+
+BACKENDS = {
+    "mss": MssBackend,
+    "pyscreeze": PyscreezeBackend,
+    "synthetic": SyntheticBackend,
+}
+
+
+def create_backend(name: str = "auto", **kwargs) -> CaptureBackend:
+    """Create a capture backend by name. 'auto' prefers mss and falls back to pyscreeze."""
+    if name == "auto":
+        try:
+            return MssBackend()
+        except ImportError:
+            return PyscreezeBackend()
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown capture backend: {name}") from None
+    return cls(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def screen_scale() -> float:
+    """Best-effort display scale factor of the primary screen (1.0 = 100%, 1.5 = 150%).
+
+    Windows reports it through shcore; elsewhere GDK_SCALE / QT_SCALE_FACTOR are used if set.
+    """
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            return ctypes.windll.shcore.GetScaleFactorForDevice(0) / 100.0
+        except Exception:
+            pass
+    for var in ("GDK_SCALE", "QT_SCALE_FACTOR"):
+        try:
+            value = float(os.environ.get(var, ""))
+        except ValueError:
+            continue
+        if value > 0:
+            return value
+    return 1.0
+
+
+class SharedCapture:
+    """Reuse one screen capture across consecutive image actions.
+
+    A frame is served again as long as it is younger than max_age seconds and nothing
+    invalidated it. Anything that can change the screen (click, typing) should call invalidate().
+    Frames come from backend (created lazily, see create_backend); region limits capture to
+    part of the desktop, e.g. one monitor.
+    """
+    def __init__(self, max_age: float = 0.5, backend: CaptureBackend | None = None,
+                 region: Region | None = None):
+        self.max_age = max_age
+        self._backend = backend
+        self.region = region
+        self._frame: Optional[Frame] = None
+        self._lock = threading.Lock()
+        self.captures = 0
+        self.reuses = 0
+
+    def frame(self) -> Frame:
+        """Return a fresh-enough frame, capturing a new one if needed."""
+        with self._lock:
+            f = self._frame
+            if f is not None and (time.monotonic() - f.ts) <= self.max_age:
+                self.reuses += 1
+                return f
+            f = self.backend.grab(self.region)
+            self._frame = f
+            self.captures += 1
+            return f
+
+    def refresh(self) -> Frame:
+        """Capture a new frame now and share it, regardless of the age of the current one."""
+        with self._lock:
+            f = self.backend.grab(self.region)
+            self._frame = f
+            self.captures += 1
+            return f
+
+    @property
+    def backend(self) -> CaptureBackend:
+        if self._backend is None:
+            self._backend = create_backend("auto")
+        return self._backend
+
+    def set_backend(self, backend: CaptureBackend | str) -> None:
+        """Switch capture backend (instance or name) and drop the cached frame."""
+        if isinstance(backend, str):
+            backend = create_backend(backend)
+        with self._lock:
+            old, self._backend = self._backend, backend
+            self._frame = None
+        if old is not None and old is not backend:
+            old.close()
+
+    def use_monitor(self, index: int | None) -> None:
+        """Restrict capture to one monitor (index into backend.monitors()), or None for all."""
+        region = None if index is None else self.backend.monitors()[index]
+        with self._lock:
+            self.region = region
+            self._frame = None
+
+    def invalidate(self) -> None:
+        """Drop the cached frame so the next lookup captures the screen again."""
+        with self._lock:
+            self._frame = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self._backend.name if self._backend else None,
+                "captures": self.captures,
+                "reuses": self.reuses,
+                "max_age": self.max_age,
+            }
+
+
+# shared by all image actions in this process
+shared_capture = SharedCapture()
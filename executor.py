@@ -0,0 +1,251 @@
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Tuple
+
+from PySide6.QtCore import QObject, Signal
+
+from plan import CancelToken, RunCancelled
+
+
+# what to do when Start is pressed while the owner already has a run going
+POLICIES = ("reject", "queue", "preempt")
+
+
+class ActionExecutor(QObject):
+    """Shared thread pool that runs action sequences for floating buttons.
+
+    Every owner (floating button) runs at most one sequence at a time; extra requests are
+    rejected, queued or preempt the current run depending on the policy. Run state is
+    reported through state_changed, which Qt delivers on the receiver's (GUI) thread.
+    """
+    # (owner, run_id, state) with state in: queued, running, done, cancelled, error, rejected
+    state_changed = Signal(object, int, str)
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 8, parent: QObject | None = None):
+        super().__init__(parent)
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="actions")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active: Dict[Any, Tuple[int, CancelToken]] = {}
+        self._queues: Dict[Any, Deque[Tuple[int, Callable[[CancelToken], None]]]] = {}
+        self._closed = False
+
+    def submit(self, owner: Any, fn: Callable[[CancelToken], None], policy: str = "reject") -> int | None:
+        """Run fn(token) for owner. Returns the run id, or None if the run was rejected."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overlap policy: {policy}")
+        run_id = next(self._ids)
+        dropped = []
+        with self._lock:
+            if self._closed:
+                return None
+            active = self._active.get(owner)
+            if active is None:
+                self._start(owner, run_id, fn)
+                return run_id
+            queue = self._queues.setdefault(owner, deque())
+            if policy == "reject" or (policy == "queue" and len(queue) >= self.max_queue):
+                state = "rejected"
+            elif policy == "preempt":
+                # drop anything waiting and stop the current run; ours starts when it returns
+                dropped = [old_id for old_id, _ in queue]
+                queue.clear()
+                queue.append((run_id, fn))
+                active[1].set()
+                state = "queued"
+            else:
+                queue.append((run_id, fn))
+                state = "queued"
+        # emit outside the lock: direct connections may call back into the executor
+        for old_id in dropped:
+            self.state_changed.emit(owner, old_id, "cancelled")
+        self.state_changed.emit(owner, run_id, state)
+        return None if state == "rejected" else run_id
+
+    def _start(self, owner: Any, run_id: int, fn: Callable[[CancelToken], None]) -> None:
+        # caller holds self._lock
+        token = CancelToken()
+        self._active[owner] = (run_id, token)
+        self._pool.submit(self._run, owner, run_id, fn, token)
+
+    def _run(self, owner: Any, run_id: int, fn: Callable[[CancelToken], None], token: CancelToken) -> None:
+        self.state_changed.emit(owner, run_id, "running")
+        state = "done"
+        try:
+            fn(token)
+            if token.is_set():
+                state = "cancelled"
+        except RunCancelled:
+            state = "cancelled"
+        except Exception as e:
+            print("Action run failed:", e)
+            state = "error"
+        with self._lock:
+            self._active.pop(owner, None)
+            # pool threads only reach GUI receivers through queued connections, so emitting
+            # under the lock is safe and keeps "done" ordered before the next run's "running"
+            self.state_changed.emit(owner, run_id, state)
+            queue = self._queues.get(owner)
+            if queue and not self._closed:
+                next_id, next_fn = queue.popleft()
+                self._start(owner, next_id, next_fn)
+
+    def cancel(self, owner: Any) -> None:
+        """Cancel the owner's current run and everything queued behind it."""
+        with self._lock:
+            queue = self._queues.pop(owner, None) or ()
+            active = self._active.get(owner)
+            if active is not None:
+                active[1].set()
+        for run_id, _ in queue:
+            self.state_changed.emit(owner, run_id, "cancelled")
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            owners = set(self._active) | set(self._queues)
+        for owner in owners:
+            self.cancel(owner)
+
+    def is_running(self, owner: Any) -> bool:
+        with self._lock:
+            return owner in self._active
+
+    def shutdown(self) -> None:
+        """Cancel all runs and stop accepting new ones."""
+        self.cancel_all()
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=False)
+
+
+class ProcessExecutor(QObject):
+    """Runs floating button sequences in a worker process (worker.WorkerClient).
+
+    Capture, matching and input happen outside the GUI process, so heavy matching never
+    competes with the Qt event loop. Same owner/policy model and state_changed signal as
+    ActionExecutor, but runs are described by their action dicts instead of a callable.
+    All signals are emitted from the client's reader thread and reach GUI receivers queued.
+    """
+    out_of_process = True
+    # (owner, run_id, state) with state in: queued, running, done, cancelled, error, rejected
+    state_changed = Signal(object, int, str)
+    # (owner, step index, step name) as each step starts
+    progress = Signal(object, int, str)
+    # (owner, step index, [left, top(, scale)]) when an image action is found somewhere new
+    hit = Signal(object, int, list)
+    # (owner, seconds) after each completed pass
+    timed = Signal(object, float)
+    # (owner, list of trace records)
+    traces = Signal(object, list)
+    # (owner, loop.LoopStats summary) when a looped run ends
+    loop_finished = Signal(object, str)
+
+    def __init__(self, max_queue: int = 8, parent: QObject | None = None, **client_options):
+        super().__init__(parent)
+        from worker import WorkerClient
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._active: Dict[Any, int] = {}        # owner -> run id
+        self._owners: Dict[int, Any] = {}        # run id -> owner
+        self._queues: Dict[Any, Deque[Tuple[int, Dict[str, Any]]]] = {}
+        # a run keeps its id from submit to done; the worker is given the same id
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.client = WorkerClient(self._on_event, **client_options)
+
+    def submit(self, owner: Any, request: Dict[str, Any], policy: str = "reject") -> int | None:
+        """Run request (WorkerClient.run keyword arguments) for owner. Returns the run id, or None."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overlap policy: {policy}")
+        run_id = next(self._ids)
+        dropped = []
+        with self._lock:
+            if self._closed:
+                return None
+            active = self._active.get(owner)
+            if active is None:
+                return self._start(owner, run_id, request)
+            queue = self._queues.setdefault(owner, deque())
+            if policy == "reject" or (policy == "queue" and len(queue) >= self.max_queue):
+                state = "rejected"
+            else:
+                if policy == "preempt":
+                    dropped = [old_id for old_id, _ in queue]
+                    queue.clear()
+                    self.client.stop(active)
+                queue.append((run_id, request))
+                state = "queued"
+        for old_id in dropped:
+            self.state_changed.emit(owner, old_id, "cancelled")
+        self.state_changed.emit(owner, run_id, state)
+        return None if state == "rejected" else run_id
+
+    def _start(self, owner: Any, run_id: int, request: Dict[str, Any]) -> int | None:
+        # caller holds self._lock
+        if self.client.run(run_id=run_id, **request) is None:
+            return None
+        self._active[owner] = run_id
+        self._owners[run_id] = owner
+        return run_id
+
+    def _on_event(self, msg: Dict[str, Any]) -> None:
+        ev = msg.get("ev")
+        with self._lock:
+            owner = self._owners.get(msg.get("id"))
+        if owner is None:
+            return
+        if ev == "running":
+            self.state_changed.emit(owner, msg["id"], "running")
+        elif ev == "step":
+            self.progress.emit(owner, msg["index"], msg["name"])
+        elif ev == "hit":
+            self.hit.emit(owner, msg["index"], msg["hit"])
+        elif ev == "timed":
+            self.timed.emit(owner, msg["seconds"])
+        elif ev == "traces":
+            self.traces.emit(owner, msg["records"])
+        elif ev == "loop":
+            self.loop_finished.emit(owner, msg["summary"])
+        elif ev == "done":
+            if msg.get("error"):
+                print("Action run failed:", msg["error"])
+            with self._lock:
+                self._owners.pop(msg["id"], None)
+                if self._active.get(owner) == msg["id"]:
+                    del self._active[owner]
+                self.state_changed.emit(owner, msg["id"], msg["state"])
+                queue = self._queues.get(owner)
+                if queue and not self._closed:
+                    next_id, request = queue.popleft()
+                    if self._start(owner, next_id, request) is None:
+                        self.state_changed.emit(owner, next_id, "error")
+
+    def cancel(self, owner: Any) -> None:
+        """Cancel the owner's current run and everything queued behind it."""
+        with self._lock:
+            queue = self._queues.pop(owner, None) or ()
+            active = self._active.get(owner)
+        if active is not None:
+            self.client.stop(active)
+        for run_id, _ in queue:
+            self.state_changed.emit(owner, run_id, "cancelled")
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            owners = set(self._active) | set(self._queues)
+        for owner in owners:
+            self.cancel(owner)
+
+    def is_running(self, owner: Any) -> bool:
+        with self._lock:
+            return owner in self._active
+
+    def shutdown(self) -> None:
+        """Cancel all runs and end the worker process."""
+        self.cancel_all()
+        with self._lock:
+            self._closed = True
+        self.client.close()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from lazy import cv2, np
+
+from capture import Frame
+from matcher import Match
+from templates import Template
+
+# default confidence for feature matching: the share of the template's keypoints that must be found
+# in a consistent position (a template that is half covered still keeps about half of them)
+FEATURE_CONFIDENCE = 0.25
+# a location needs at least this many agreeing keypoints, whatever the confidence
+MIN_INLIERS = 6
+# templates need a margin above MIN_INLIERS: with barely enough keypoints, any occlusion or
+# missed keypoint makes the match fail, and a few chance matches can pass RANSAC
+MIN_TEMPLATE_KEYPOINTS = 3 * MIN_INLIERS
+# Lowe's ratio test: the best descriptor match must be clearly better than the second best
+RATIO = 0.75
+# keypoints kept per frame (bounds description and matching time on large screens)
+FRAME_FEATURES = 5000
+# below this many frame descriptors a brute force matcher is faster than building an LSH index
+FLANN_MIN_DESCRIPTORS = 1000
+RANSAC_THRESHOLD = 4.0
+
+_FLANN_INDEX_LSH = 6
+_local = threading.local()
+
+
+def _detector(method: str, frame: bool):
+    # detectors are not thread safe; keep one per thread
+    key = (method, frame)
+    cache = getattr(_local, "detectors", None)
+    if cache is None:
+        cache = _local.detectors = {}
+    det = cache.get(key)
+    if det is None:
+        if method == "orb":
+            # small patches, so that small templates (buttons, icons) still yield keypoints
+            det = cv2.ORB_create(nfeatures=FRAME_FEATURES if frame else 500, edgeThreshold=15, patchSize=15,
+                                 fastThreshold=10)
+        elif method == "akaze":
+            det = cv2.AKAZE_create(threshold=0.0005)
+        else:
+            raise ValueError(f"Unknown feature method: {method}")
+        cache[key] = det
+    return det
+
+
+class Features:
+    """Keypoints and binary descriptors of one image, plus a lazily built descriptor index."""
+    __slots__ = ("points", "descriptors", "_index")
+
+    def __init__(self, keypoints, descriptors):
+        self.points = np.float32([kp.pt for kp in keypoints]).reshape(-1, 2)
+        self.descriptors = descriptors
+        self._index = None
+
+    def __len__(self) -> int:
+        return 0 if self.descriptors is None else len(self.descriptors)
+
+    def index(self):
+        """Matcher over these descriptors: an LSH (FLANN) index when there are many, else brute force."""
+        if self._index is None:
+            if len(self) >= FLANN_MIN_DESCRIPTORS:
+                m = cv2.FlannBasedMatcher(dict(algorithm=_FLANN_INDEX_LSH, table_number=6, key_size=12,
+                                               multi_probe_level=1), dict(checks=32))
+            else:
+                m = cv2.BFMatcher(cv2.NORM_HAMMING)
+            m.add([self.descriptors])
+            m.train()
+            self._index = m
+        return self._index
+
+
+def _detect(gray: np.ndarray, method: str, frame: bool) -> Features:
+    det = _detector(method, frame)
+    if method == "orb" or not frame:
+        kps, desc = det.detectAndCompute(gray, None)
+    else:
+        # AKAZE has no keypoint limit; describe only the strongest FRAME_FEATURES (what
+        # KeyPointsFilter::retainBest does, which the Python bindings don't expose)
+        kps = det.detect(gray, None)
+        if len(kps) > FRAME_FEATURES:
+            response = np.fromiter((kp.response for kp in kps), np.float32, len(kps))
+            best = np.argpartition(-response, FRAME_FEATURES)[:FRAME_FEATURES]
+            kps = [kps[i] for i in best]
+        kps, desc = det.compute(gray, kps)
+    return Features(kps or (), desc)
+
+
+def template_features(tpl: Template, method: str) -> Features:
+    """Keypoints of a template, computed once per method and kept on the template."""
+    f = tpl._features.get(method)
+    if f is None:
+        f = tpl._features[method] = _detect(tpl.gray, method, False)
+    return f
+
+
+def frame_features(frame: Frame, method: str) -> Features:
+    """Keypoints of a captured frame, computed once and shared by all feature matches on it."""
+    f = frame._features.get(method)
+    if f is None:
+        f = frame._features[method] = _detect(frame.gray, method, True)
+    return f
+
+
+def locate_features(tpl: Template, frame: Frame, confidence: float = FEATURE_CONFIDENCE,
+                    method: str = "orb") -> Optional[Match]:
+    """Locate a template by its keypoints; tolerates scaling, partial occlusion and color changes.
+
+    Template descriptors are matched against the frame's (k=2, ratio test) and a similarity
+    transform (scale, rotation, shift) is fitted with RANSAC. The score is the share of the
+    template's keypoints that agree with it; the returned rectangle is the transformed template
+    outline and Match.scale the fitted scale.
+    """
+    tf = template_features(tpl, method)
+    if len(tf) < MIN_INLIERS:
+        return None
+    ff = frame_features(frame, method)
+    if len(ff) < 2:
+        return None
+    good = []
+    for pair in ff.index().knnMatch(tf.descriptors, k=2):
+        if len(pair) == 2 and pair[0].distance < RATIO * pair[1].distance:
+            good.append(pair[0])
+    if len(good) < MIN_INLIERS:
+        return None
+    src = tf.points[[m.queryIdx for m in good]]
+    dst = ff.points[[m.trainIdx for m in good]]
+    transform, inliers = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC,
+                                                     ransacReprojThreshold=RANSAC_THRESHOLD)
+    if transform is None:
+        return None
+    count = int(inliers.sum())
+    score = count / len(tf)
+    if count < MIN_INLIERS or score < confidence:
+        return None
+    w, h = tpl.size
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+    box = cv2.transform(corners, transform).reshape(-1, 2)
+    x0, y0 = box.min(axis=0)
+    x1, y1 = box.max(axis=0)
+    scale = float(np.hypot(transform[0, 0], transform[1, 0]))
+    return Match(frame.left + int(round(x0)), frame.top + int(round(y0)), int(round(x1 - x0)),
+                 int(round(y1 - y0)), min(1.0, score), round(scale, 3))
+
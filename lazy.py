@@ -0,0 +1,45 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Callable
+
+
+class LazyModule:
+    """Stand-in for a heavy module (cv2, numpy, pyautogui) that is imported on first attribute access.
+
+    Keeps startup fast for the headless runner: e.g. a run of write-only actions never loads
+    OpenCV, and nothing touches the display until the first click or screenshot.
+    """
+    def __init__(self, name: str, on_load: Callable[[ModuleType], None] | None = None):
+        self._name = name
+        self._on_load = on_load
+        self._module: ModuleType | None = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        mod = self._module
+        if mod is None:
+            with self._lock:
+                if self._module is None:
+                    m = importlib.import_module(self._name)
+                    if self._on_load is not None:
+                        self._on_load(m)
+                    self._module = m
+                mod = self._module
+        return mod
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def _setup_pyautogui(m: ModuleType) -> None:
+    m.FAILSAFE = True
+
+
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
+pyautogui = LazyModule("pyautogui", _setup_pyautogui)
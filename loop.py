@@ -0,0 +1,118 @@
+import math
+import time
+from typing import Callable
+
+from plan import CancelToken
+from tracing import RunStats
+
+
+class LoopSpec:
+    """How to repeat a plan.
+
+    count and duration (seconds) both limit the loop, whichever ends it first; with neither it
+    runs until stopped. rate is the target number of iterations per second (None = back to back).
+    """
+    __slots__ = ("count", "duration", "rate")
+
+    def __init__(self, count: int | None = None, duration: float | None = None, rate: float | None = None):
+        if count is not None and count < 1:
+            raise ValueError("count must be at least 1")
+        if duration is not None and duration <= 0:
+            raise ValueError("duration must be positive")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        self.count = count
+        self.duration = duration
+        self.rate = rate
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.rate if self.rate else 0.0
+
+    def describe(self) -> str:
+        parts = []
+        if self.count is not None:
+            parts.append(f"{self.count}×")
+        if self.duration is not None:
+            parts.append(f"for {self.duration:g}s")
+        if not parts:
+            parts.append("until stopped")
+        if self.rate:
+            parts.append(f"at {self.rate:g}/s")
+        return " ".join(parts)
+
+
+class LoopStats:
+    """Per-iteration numbers of one loop.
+
+    times are iteration durations; lateness is how far each iteration started after its slot.
+    overruns counts iterations that took longer than the period (their missed slots are skipped).
+    """
+    def __init__(self, window: int = 1000):
+        self.iterations = 0
+        self.overruns = 0
+        self.elapsed = 0.0
+        self.times = RunStats(window)
+        self.lateness = RunStats(window)
+
+    def summary(self) -> str:
+        if not self.iterations:
+            return "0 iterations"
+        p50, p95 = self.times.percentile(50), self.times.percentile(95)
+        text = (f"{self.iterations} iterations in {self.elapsed:.2f}s · "
+                f"p50 {p50 * 1000:.0f} ms · p95 {p95 * 1000:.0f} ms")
+        if len(self.lateness):
+            text += f" · start jitter p95 {self.lateness.percentile(95) * 1000:.1f} ms"
+        if self.overruns:
+            text += f" · {self.overruns} overruns"
+        return text
+
+
+IterationCallback = Callable[[int, float], None]
+
+
+def run_loop(run_once: Callable[[int], None], spec: LoopSpec, token: CancelToken | None = None,
+             on_iteration: IterationCallback | None = None, stats: LoopStats | None = None) -> LoopStats:
+    """Call run_once(iteration) repeatedly as described by spec, on the calling thread.
+
+    Iteration k is scheduled at start + k * period, so waiting never accumulates drift; an
+    iteration that overruns its slot makes the next one start at the following free slot
+    instead of bursting to catch up. Cancellation (RunCancelled) propagates to the caller;
+    stats holds what was measured until then. on_iteration(iterations done, seconds) runs after each one.
+    """
+    token = token or CancelToken()
+    stats = stats if stats is not None else LoopStats()
+    period = spec.period
+    start = time.perf_counter()
+    end = start + spec.duration if spec.duration is not None else math.inf
+    slot = 0
+    i = 0
+    try:
+        while spec.count is None or i < spec.count:
+            target = start + slot * period
+            if target >= end:
+                break
+            now = time.perf_counter()
+            if target > now:
+                token.sleep(target - now)
+                now = time.perf_counter()
+            token.check()
+            if now >= end:
+                break
+            if period:
+                stats.lateness.add(now - target)
+            run_once(i)
+            done = time.perf_counter()
+            stats.times.add(done - now)
+            stats.iterations = i = i + 1
+            if period:
+                nxt = slot + 1
+                if start + nxt * period < done:
+                    stats.overruns += 1
+                    nxt = math.ceil((done - start) / period)
+                slot = nxt
+            if on_iteration is not None:
+                on_iteration(i, done - now)
+    finally:
+        stats.elapsed = time.perf_counter() - start
+    return stats
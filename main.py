@@ -5,14 +5,24 @@ from typing import List, Dict
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QHBoxLayout,
-    QListWidget, QLineEdit, QFileDialog, QLabel, QMessageBox, QComboBox, QAbstractItemView
+    QListView, QLineEdit, QFileDialog, QLabel, QMessageBox, QComboBox, QAbstractItemView, QCheckBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QSize
 from PySide6.QtGui import QFont
 from PySide6.QtWidgets import QFrame, QSpacerItem, QSizePolicy
 
 from button import FloatingButton, MouseController
-from storage import load_actions, save_actions
+from executor import ActionExecutor, ProcessExecutor
+from tracing import TraceWriter
+from storage import ActionStore
+from action_model import ActionListModel
+from plan import PlanError, compile_plan
+from textinput import INPUT_MODES
+from motion import PROFILES
+from triggers import trigger_loop
+from templates import template_cache
+from bundle import TemplateBundle, bundle_path
+from thumbnails import ThumbnailLoader
 
 class ActionManagerWindow(QMainWindow):
     """Window to add/manage actions (type + parameter) and spawn floating buttons bound to them.
@@ -76,15 +86,25 @@ class ActionManagerWindow(QMainWindow):
         lbl_actions.setStyleSheet(f"color: {TEXT}; font-weight: 600;")
         left_col.addWidget(lbl_actions)
 
-        self.list_widget = QListWidget()
-        self.list_widget.setAlternatingRowColors(True)
-        self.list_widget.setStyleSheet(
-            f"QListWidget {{ background: {CARD_BG}; border: 1px solid {PANEL_BORDER}; border-radius: 8px; padding: 6px; color: {TEXT}; }}"
-            f"QListWidget::item {{ padding: 10px; color: {TEXT}; }}"
-            f"QListWidget::item:selected {{ background: rgba(30,144,255,0.14); color: {TEXT}; }}"
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search actions...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.setStyleSheet(
+            f"QLineEdit{{background:{INPUT_BG}; color:{TEXT}; border:1px solid {PANEL_BORDER}; border-radius:6px; padding:6px;}}"
+        )
+        left_col.addWidget(self.search_input)
+
+        self.list_view = QListView()
+        self.list_view.setAlternatingRowColors(True)
+        self.list_view.setStyleSheet(
+            f"QListView {{ background: {CARD_BG}; border: 1px solid {PANEL_BORDER}; border-radius: 8px; padding: 6px; color: {TEXT}; }}"
+            f"QListView::item {{ padding: 10px; color: {TEXT}; }}"
+            f"QListView::item:selected {{ background: rgba(30,144,255,0.14); color: {TEXT}; }}"
         )
-        self.list_widget.setSelectionMode(QAbstractItemView.SingleSelection)
-        left_col.addWidget(self.list_widget, stretch=1)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # all rows have the same height: lets the view skip measuring every row
+        self.list_view.setUniformItemSizes(True)
+        left_col.addWidget(self.list_view, stretch=1)
 
         list_controls = QHBoxLayout()
         self.move_up_btn = QPushButton("↑")
@@ -169,6 +189,31 @@ class ActionManagerWindow(QMainWindow):
             "QPushButton:hover{background:#142033}"
         )
         param_row.addWidget(self.choose_btn)
+
+        # input strategy for write actions
+        self.input_combo = QComboBox()
+        self.input_combo.addItems(list(INPUT_MODES))
+        self.input_combo.setFixedWidth(100)
+        self.input_combo.setToolTip(
+            "type: 5 chars/s (default)\nbulk: no delay between keys\n"
+            "paste: via clipboard\nchunked: throttled bulk typing"
+        )
+        self.input_combo.setStyleSheet(self.type_combo.styleSheet())
+        param_row.addWidget(self.input_combo)
+
+        # mouse motion for image actions
+        self.motion_combo = QComboBox()
+        self.motion_combo.addItems(["default", *[p for p in PROFILES if p != "default"]])
+        self.motion_combo.setFixedWidth(100)
+        self.motion_combo.setToolTip("Mouse motion when clicking the image (instant = no travel time)")
+        self.motion_combo.setStyleSheet(self.type_combo.styleSheet())
+        param_row.addWidget(self.motion_combo)
+
+        # multi-scale matching for images captured at another display scale
+        self.scales_check = QCheckBox("Any DPI")
+        self.scales_check.setToolTip("Also match the image resized for 125%/150%/... display scaling")
+        self.scales_check.setStyleSheet(f"QCheckBox{{color:{TEXT};}}")
+        param_row.addWidget(self.scales_check)
         panel_l.addLayout(param_row)
 
         # add button
@@ -198,6 +243,12 @@ class ActionManagerWindow(QMainWindow):
         spawn_btn.clicked.connect(self.create_floating_for_selected)
         ops_col.addWidget(spawn_btn)
 
+        self.worker_check = QCheckBox("Run in worker process")
+        self.worker_check.setToolTip("New floating buttons run their actions in a separate process,\n"
+                                     "restarted automatically if it crashes or hangs")
+        self.worker_check.setStyleSheet(f"QCheckBox{{color:{TEXT};}}")
+        ops_col.addWidget(self.worker_check)
+
         # larger danger button
         remove_btn = QPushButton("Remove Selected")
         remove_btn.setCursor(Qt.PointingHandCursor)
@@ -223,14 +274,27 @@ class ActionManagerWindow(QMainWindow):
 
         # store floating buttons to avoid GC
         self._floating_buttons: List[FloatingButton] = []
+        # one executor runs the sequences of all floating buttons
+        self.executor = ActionExecutor(parent=self)
+        # started on first use when "Run in worker process" is checked
+        self.process_executor: ProcessExecutor | None = None
+        # per-action timing traces of all floating buttons (rotating logs/trace.jsonl)
+        self.trace_writer = TraceWriter()
+        # persist last found location of image actions into actions.json
+        self.remember_hits = True
 
         # load saved actions AFTER widgets created
-        self._actions: List[Dict[str, str]] = load_actions()
-        for a in self._actions:
-            name = a.get("name", "")
-            atype = a.get("type", "")
-            param = a.get("param", "")
-            self.list_widget.addItem(f"{name} [{atype}] — {param}")
+        # edits are journaled; the store compacts actions.json in the background
+        self._store = ActionStore()
+        self._actions: List[Dict[str, str]] = self._store.load()
+        # pre-decoded templates written next to actions.json on save
+        template_cache.use_bundle(TemplateBundle.open(bundle_path(self._store.path)))
+        # rows are rendered lazily from the store by the model; image previews load in the background
+        self.thumbnails = ThumbnailLoader(parent=self)
+        self.list_view.setIconSize(QSize(self.thumbnails.size, self.thumbnails.size))
+        self.model = ActionListModel(self._store, self, thumbnails=self.thumbnails)
+        self.list_view.setModel(self.model)
+        self.search_input.textChanged.connect(self._on_search)
 
         # initial UI state
         self._on_type_changed(self.type_combo.currentText())
@@ -239,9 +303,15 @@ class ActionManagerWindow(QMainWindow):
         """Toggle choose button visibility and placeholder based on action type."""
         if t == "image":
             self.choose_btn.setVisible(True)
+            self.motion_combo.setVisible(True)
+            self.scales_check.setVisible(True)
+            self.input_combo.setVisible(False)
             self.param_input.setPlaceholderText("Path to image file (png/jpg/bmp)...")
         else:
             self.choose_btn.setVisible(False)
+            self.motion_combo.setVisible(False)
+            self.scales_check.setVisible(False)
+            self.input_combo.setVisible(True)
             self.param_input.setPlaceholderText("Text to write when action runs...")
 
     def choose_image(self):
@@ -268,56 +338,108 @@ class ActionManagerWindow(QMainWindow):
                 return
 
         entry = {'name': name, 'type': atype, 'param': param}
-        self._actions.append(entry)
-        self.list_widget.addItem(f"{name} [{atype}] — {param}")
-        save_actions(self._actions)
+        if atype == "write" and self.input_combo.currentText() != "type":
+            entry['input'] = self.input_combo.currentText()
+        if atype == "image" and self.motion_combo.currentText() != "default":
+            entry['motion'] = self.motion_combo.currentText()
+        if atype == "image" and self.scales_check.isChecked():
+            entry['scales'] = "auto"
+        self.model.append(entry)
 
         self.param_input.clear()
         self.name_input.clear()
 
+    def _selected_rows(self) -> List[int]:
+        """Selected rows of the list view (view rows, not store indices)."""
+        return sorted(i.row() for i in self.list_view.selectionModel().selectedRows())
+
+    def _select_rows(self, rows: List[int]):
+        sel = self.list_view.selectionModel()
+        sel.clearSelection()
+        for r in rows:
+            sel.select(self.model.index(r), sel.SelectionFlag.Select)
+        if rows:
+            sel.setCurrentIndex(self.model.index(rows[0]), sel.SelectionFlag.NoUpdate)
+            self.list_view.scrollTo(self.model.index(rows[0]))
+
+    def _on_search(self, text: str):
+        self.model.set_filter(text)
+        # reordering a filtered view would be ambiguous
+        self.move_up_btn.setEnabled(not self.model.filtering)
+        self.move_down_btn.setEnabled(not self.model.filtering)
+
     def remove_selected(self):
-        idx = self.list_widget.currentRow()
-        if idx >= 0:
-            self.list_widget.takeItem(idx)
-            del self._actions[idx]
-            save_actions(self._actions)
+        rows = self._selected_rows()
+        if rows:
+            self.model.remove_rows(rows)
 
     def create_floating_for_selected(self):
         
         # require at least one action selected (or inform user)
-        idx = self.list_widget.currentRow()
-        if idx < 0 or not self._actions:
+        if not self._selected_rows() or not self._actions:
             QMessageBox.information(self, "Select action", "Please select an action from the list first.")
             return
 
         # Execute actions in the exact order shown in the list (top -> bottom)
         sequence = [dict(a) for a in self._actions]  # copy current order
 
+        # validate and preload everything now, so runs only execute
+        try:
+            plan = compile_plan(sequence)
+        except PlanError as e:
+            QMessageBox.warning(self, "Invalid actions", "Cannot create floating button:\n\n" + str(e))
+            return
+
         geom = self.geometry()
         spawn_pos = (geom.x() + geom.width() + 10, geom.y() + 30)
 
         fb = FloatingButton(diameter=50, initial_pos=spawn_pos)
         fb.action_sequence = sequence
+        # stored actions the plan was compiled from, so hit locations can be persisted
+        fb.set_plan(plan, list(self._actions))
+        fb.set_executor(self._executor_for_new_button())
+        fb.trace_writer = self.trace_writer
+        fb.last_hit_changed.connect(self._remember_hit)
         fb.show()
         self._floating_buttons.append(fb)
 
+    def _executor_for_new_button(self):
+        if not self.worker_check.isChecked():
+            return self.executor
+        if self.process_executor is None:
+            # the worker serves templates from the same bundle as this process
+            self.process_executor = ProcessExecutor(parent=self, bundle=bundle_path(self._store.path))
+        return self.process_executor
+
+    def _remember_hit(self, action: Dict, hit: list):
+        """Store where an image action was last found, so the next run searches there first."""
+        if not self.remember_hits:
+            return
+        # the action may have been removed since the floating button was created
+        idx = self.model.source_of(action)
+        if idx < 0:
+            return
+        self.model.update_action(idx, last_hit=list(hit))
+
     def _move_selected_up(self):
-        idx = self.list_widget.currentRow()
-        if idx > 0:
-            self._actions[idx - 1], self._actions[idx] = self._actions[idx], self._actions[idx - 1]
-            item = self.list_widget.takeItem(idx)
-            self.list_widget.insertItem(idx - 1, item)
-            self.list_widget.setCurrentRow(idx - 1)
-            save_actions(self._actions)
+        rows = self._selected_rows()
+        if rows:
+            self._select_rows(self.model.move_rows(rows, -1))
 
     def _move_selected_down(self):
-        idx = self.list_widget.currentRow()
-        if 0 <= idx < len(self._actions) - 1:
-            self._actions[idx + 1], self._actions[idx] = self._actions[idx], self._actions[idx + 1]
-            item = self.list_widget.takeItem(idx)
-            self.list_widget.insertItem(idx + 1, item)
-            self.list_widget.setCurrentRow(idx + 1)
-            save_actions(self._actions)
+        rows = self._selected_rows()
+        if rows:
+            self._select_rows(self.model.move_rows(rows, 1))
+
+    def closeEvent(self, event):
+        # stop running sequences (and image triggers) so they don't keep clicking after the window is gone
+        trigger_loop.stop()
+        self.executor.shutdown()
+        self.thumbnails.shutdown()
+        if self.process_executor is not None:
+            self.process_executor.shutdown()
+        self._store.close()
+        super().closeEvent(event)
 
     # debugging helper: klik di main window menunjukkan widget yang ada di titik tersebut
     # normal behavior: no debug logging
@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lazy import cv2, np
+
+from capture import Frame, Region, screen_scale
+from templates import Template
+
+
+class Match:
+    """Result of a template match, in virtual desktop coordinates."""
+    __slots__ = ("left", "top", "width", "height", "score", "scale")
+
+    def __init__(self, left: int, top: int, width: int, height: int, score: float, scale: float = 1.0):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.score = score
+        # template scale that matched (see locate_scaled)
+        self.scale = scale
+
+    @property
+    def center(self) -> tuple:
+        return self.left + self.width // 2, self.top + self.height // 2
+
+    def __repr__(self) -> str:
+        return (f"Match(left={self.left}, top={self.top}, w={self.width}, h={self.height}, "
+                f"score={self.score:.3f}, scale={self.scale:g})")
+
+
+# scores this close count as a tie. matchTemplate's FFT path gives slightly different floats for the
+# same window depending on the haystack size, so exact duplicates must not be decided by rounding noise
+SCORE_TIE = 1e-4
+
+
+def match_array(haystack: np.ndarray, needle: np.ndarray, confidence: float) -> Optional[Match]:
+    """Best TM_CCOEFF_NORMED match of needle in haystack (same scoring as pyscreeze's confidence).
+
+    Coordinates are relative to the haystack. Returns None when the best score is below confidence.
+    Of several (near-)equal best matches the topmost, then leftmost one is returned.
+    """
+    hh, hw = haystack.shape[:2]
+    nh, nw = needle.shape[:2]
+    if nh > hh or nw > hw:
+        return None
+    result = cv2.matchTemplate(haystack, needle, cv2.TM_CCOEFF_NORMED)
+    _, score, _, _ = cv2.minMaxLoc(result)
+    if score < confidence:
+        return None
+    y, x = np.unravel_index(int(np.argmax(result >= score - SCORE_TIE)), result.shape)
+    return Match(int(x), int(y), nw, nh, float(result[y, x]))
+
+
+# search padding around the last hit, in multiples of the template size, tried in order
+ROI_PADDING = (0.5, 2.0, 6.0)
+
+
+def _crop(frame: Frame, region: Tuple[int, int, int, int] | None) -> Tuple[int, int, int, int]:
+    """Clip a (left, top, width, height) desktop region to the frame. Returns frame-relative x0, y0, x1, y1."""
+    fw, fh = frame.size
+    if region is None:
+        return 0, 0, fw, fh
+    left, top, w, h = region
+    x0 = max(0, int(left) - frame.left)
+    y0 = max(0, int(top) - frame.top)
+    x1 = min(fw, int(left) - frame.left + int(w))
+    y1 = min(fh, int(top) - frame.top + int(h))
+    return x0, y0, max(x0, x1), max(y0, y1)
+
+
+def _best(matches) -> Optional[Match]:
+    """Highest score; ties (within SCORE_TIE) go to the topmost, then leftmost match."""
+    best = None
+    for m in matches:
+        if m is None:
+            continue
+        if best is None or m.score > best.score + SCORE_TIE or (
+                abs(m.score - best.score) <= SCORE_TIE and (m.top, m.left) < (best.top, best.left)):
+            best = m
+    return best
+
+
+class TiledMatcher:
+    """Runs full frame matches as tiles on a thread pool (cv2.matchTemplate releases the GIL).
+
+    By default the frame is cut into horizontal bands that overlap by the template height minus
+    one, so every position is scored exactly once and the merged result equals a single
+    matchTemplate call. With use_monitors() each monitor is one tile instead (a template
+    straddling two monitors is then not found). Frames smaller than min_pixels are matched in
+    one piece; threads=1 turns tiling off.
+    """
+    # don't cut bands thinner than this many result rows
+    MIN_BAND_ROWS = 64
+
+    def __init__(self, threads: int | None = None, min_pixels: int = 1_000_000):
+        self.threads = threads if threads is not None else min(8, os.cpu_count() or 1)
+        self.min_pixels = min_pixels
+        self.monitors: List[Region] | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def set_threads(self, threads: int) -> None:
+        """Change the pool size (1 = match in the calling thread only)."""
+        if threads < 1:
+            raise ValueError("threads must be at least 1")
+        with self._lock:
+            if threads != self.threads and self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            self.threads = threads
+
+    def use_monitors(self, monitors: Sequence[Region] | None) -> None:
+        """Match one tile per monitor (desktop regions, e.g. capture backend monitors()); None = bands."""
+        self.monitors = list(monitors) if monitors else None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="match")
+            return self._pool
+
+    def wants(self, haystack: np.ndarray, needle: np.ndarray) -> bool:
+        hh, hw = haystack.shape[:2]
+        return self.threads > 1 and hh * hw >= self.min_pixels and hh - needle.shape[0] >= 2 * self.MIN_BAND_ROWS
+
+    def _tiles(self, frame: Frame, hh: int, hw: int, nh: int) -> List[Tuple[int, int, int, int]]:
+        # frame-relative x0, y0, x1, y1 of each tile
+        if self.monitors:
+            tiles = [_crop(frame, mon) for mon in self.monitors]
+            return [t for t in tiles if t[2] > t[0] and t[3] > t[1]]
+        rows = hh - nh + 1
+        n = max(1, min(self.threads, rows // self.MIN_BAND_ROWS))
+        step = -(-rows // n)
+        return [(0, r0, hw, min(rows, r0 + step) + nh - 1) for r0 in range(0, rows, step)]
+
+    def locate(self, frame: Frame, haystack: np.ndarray, needle: np.ndarray, confidence: float) -> Optional[Match]:
+        """Best match of needle in haystack (the whole frame image or its gray version), in desktop coords."""
+        tiles = self._tiles(frame, *haystack.shape[:2], needle.shape[0])
+
+        def run(tile):
+            x0, y0, x1, y1 = tile
+            m = match_array(haystack[y0:y1, x0:x1], needle, confidence)
+            if m is not None:
+                m.left += frame.left + x0
+                m.top += frame.top + y0
+            return m
+
+        if len(tiles) == 1:
+            return run(tiles[0])
+        return _best(self._executor().map(run, tiles))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+# shared by all full frame searches; configure with tiled_matcher.set_threads(n) / use_monitors(...)
+tiled_matcher = TiledMatcher()
+
+
+def locate(tpl: Template, frame: Frame, confidence: float = 0.7, grayscale: bool = False,
+           region: Tuple[int, int, int, int] | None = None) -> Optional[Match]:
+    """Locate a cached template on a captured frame, optionally only inside region (desktop coords).
+
+    Large full frame searches are split into tiles and run in parallel by tiled_matcher.
+    """
+    hay = frame.gray if grayscale else frame.image
+    needle = tpl.gray if grayscale else tpl.color
+    if region is None and tiled_matcher.wants(hay, needle):
+        return tiled_matcher.locate(frame, hay, needle, confidence)
+    x0, y0, x1, y1 = _crop(frame, region)
+    m = match_array(hay[y0:y1, x0:x1], needle, confidence)
+    if m is not None:
+        m.left += frame.left + x0
+        m.top += frame.top + y0
+    return m
+
+
+# coarse pass accepts candidates this much below the requested confidence (downscaling blurs scores)
+PYRAMID_SLACK = 0.15
+# never shrink a template below this many pixels on its short side
+PYRAMID_MIN_SIZE = 12
+PYRAMID_CANDIDATES = 5
+
+
+def _top_candidates(result: np.ndarray, threshold: float, count: int, nw: int, nh: int) -> list:
+    """Best count (x, y) positions of a match result above threshold, suppressing overlaps."""
+    res = result.copy()
+    out = []
+    for _ in range(count):
+        _, score, _, (x, y) = cv2.minMaxLoc(res)
+        if score < threshold:
+            break
+        out.append((x, y))
+        res[max(0, y - nh // 2):y + nh // 2 + 1, max(0, x - nw // 2):x + nw // 2 + 1] = -1.0
+    return out
+
+
+def locate_pyramid(tpl: Template, frame: Frame, confidence: float = 0.7, grayscale: bool = False,
+                   levels: int = 2) -> Optional[Match]:
+    """Coarse-to-fine match: find candidates on a frame downscaled by 2**levels, confirm them at full resolution.
+
+    The result has the same confidence semantics as locate(). If the coarse pass finds no
+    candidate, or none survives confirmation, a full resolution search is done instead.
+    """
+    w, h = tpl.size
+    while levels > 0 and min(w, h) >> levels < PYRAMID_MIN_SIZE:
+        levels -= 1
+    if levels <= 0:
+        return locate(tpl, frame, confidence, grayscale)
+
+    hay = frame.level(levels, grayscale)
+    needle = tpl.level(levels, grayscale)
+    nh, nw = needle.shape[:2]
+    if nh > hay.shape[0] or nw > hay.shape[1]:
+        return None
+    result = cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED)
+    scale = 1 << levels
+    best = None
+    for cx, cy in _top_candidates(result, confidence - PYRAMID_SLACK, PYRAMID_CANDIDATES, nw, nh):
+        # confirm in a small window around the upscaled coarse position
+        x = frame.left + cx * scale - scale
+        y = frame.top + cy * scale - scale
+        m = locate(tpl, frame, confidence, grayscale, region=(x, y, w + 2 * scale, h + 2 * scale))
+        if m is not None and (best is None or m.score > best.score):
+            best = m
+    if best is None:
+        # accuracy fallback: the coarse pass can miss thin or high-frequency templates
+        return locate(tpl, frame, confidence, grayscale)
+    return best
+
+
+# "match" values of image actions that use keypoints instead of template matching (see features.py)
+FEATURE_METHODS = ("orb", "akaze")
+
+
+def search(tpl: Template, frame: Frame, confidence: float = 0.7, grayscale: bool = False,
+           method: str = "template", levels: int = 2) -> Optional[Match]:
+    """Full frame search with the chosen method ('template', 'pyramid', or a keypoint method: 'orb', 'akaze')."""
+    if method in FEATURE_METHODS:
+        from features import locate_features
+        return locate_features(tpl, frame, confidence, method)
+    if method == "pyramid":
+        return locate_pyramid(tpl, frame, confidence, grayscale, levels)
+    if method == "template":
+        return locate(tpl, frame, confidence, grayscale)
+    raise ValueError(f"Unknown match method: {method}")
+
+
+def _locate_around(tpl: Template, frame: Frame, hint: Sequence[int], confidence: float, grayscale: bool,
+                   padding: Sequence[float]) -> Optional[Match]:
+    # growing windows around the hinted top-left position, no full frame fallback
+    w, h = tpl.size
+    hx, hy = int(hint[0]), int(hint[1])
+    for pad in padding:
+        px, py = max(8, int(w * pad)), max(8, int(h * pad))
+        m = locate(tpl, frame, confidence, grayscale, region=(hx - px, hy - py, w + 2 * px, h + 2 * py))
+        if m is not None:
+            return m
+    return None
+
+
+def locate_near(tpl: Template, frame: Frame, hint: Sequence[int] | None, confidence: float = 0.7,
+                grayscale: bool = False, padding: Sequence[float] = ROI_PADDING,
+                method: str = "template", levels: int = 2) -> Optional[Match]:
+    """Locate a template, searching around its last known top-left position first.
+
+    The search area grows through padding (multiples of the template size) and finally
+    falls back to a full frame search with method (see search()). Keypoint methods have their
+    own confidence scale, so they skip the window search and always use the whole frame.
+    """
+    if hint and method not in FEATURE_METHODS:
+        m = _locate_around(tpl, frame, hint, confidence, grayscale, padding)
+        if m is not None:
+            return m
+    return search(tpl, frame, confidence, grayscale, method, levels)
+
+
+# common OS display scale settings; a template captured at one of them may be replayed at another
+SCALE_STEPS = (1.0, 1.25, 1.5, 1.75, 2.0)
+SCALE_RANGE = (0.4, 2.5)
+# scales are ranked with a cheap grayscale match on the frame downscaled by 2**SCALE_RANK_LEVEL
+SCALE_RANK_LEVEL = 2
+
+
+def scale_set(screen: float | None = None) -> Tuple[float, ...]:
+    """Template scales to try on a screen with the given display scale (default: detected).
+
+    One ratio per SCALE_STEPS entry the template may have been captured at, most likely first:
+    captured at 100% (ratio = screen scale), then by distance from that, always including 1.0.
+    """
+    screen = screen_scale() if screen is None else screen
+    lo, hi = SCALE_RANGE
+    ratios = {round(screen / s, 3) for s in SCALE_STEPS} | {1.0}
+    ratios = [r for r in ratios if lo <= r <= hi]
+    return tuple(sorted(ratios, key=lambda r: abs(math.log(r / screen))))
+
+
+def _rank_scales(tpl: Template, frame: Frame, scales: Sequence[float]) -> list:
+    """Order scales by their best score on a downscaled grayscale frame (stable for ties)."""
+    scales = list(scales)
+    level = SCALE_RANK_LEVEL
+    short = min(tpl.size) * min(scales)
+    while level > 0 and short / (1 << level) < PYRAMID_MIN_SIZE:
+        level -= 1
+    if level <= 0 or len(scales) < 2:
+        return scales
+    hay = frame.level(level, True)
+    scored = []
+    for s in scales:
+        needle = tpl.scaled(s).level(level, True)
+        if needle.shape[0] > hay.shape[0] or needle.shape[1] > hay.shape[1]:
+            continue
+        _, score, _, _ = cv2.minMaxLoc(cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED))
+        scored.append((score, s))
+    scored.sort(key=lambda x: -x[0])
+    return [s for _, s in scored]
+
+
+def locate_scaled(tpl: Template, frame: Frame, scales: Sequence[float], hint: Sequence[float] | None = None,
+                  confidence: float = 0.7, grayscale: bool = False, method: str = "template",
+                  levels: int = 2) -> Optional[Match]:
+    """Multi-scale search with precomputed variants of tpl (Template.scaled).
+
+    hint is [left, top] or [left, top, scale] as stored from an earlier match. The remembered
+    scale is tried first, around the hint and then over the whole frame. Only if it misses
+    are the other scales tried: around the hint first, then over the whole frame in the order
+    of a cheap coarse-level ranking, so usually only one full resolution search is needed.
+    The returned Match records its scale.
+    """
+    remembered = round(float(hint[2]), 3) if hint and len(hint) > 2 else None
+    order = list(scales)
+    if remembered is not None:
+        m = locate_near(tpl.scaled(remembered), frame, hint, confidence, grayscale, method=method, levels=levels)
+        if m is not None:
+            m.scale = remembered
+            return m
+        order = [s for s in order if s != remembered]
+    if hint:
+        for s in order:
+            m = _locate_around(tpl.scaled(s), frame, hint, confidence, grayscale, ROI_PADDING)
+            if m is not None:
+                m.scale = s
+                return m
+    for s in _rank_scales(tpl, frame, order):
+        m = search(tpl.scaled(s), frame, confidence, grayscale, method, levels)
+        if m is not None:
+            m.scale = s
+            return m
+    return None
+
+
+# adaptive polling for wait_for: start tight, back off geometrically up to POLL_MAX seconds
+POLL_START = 0.02
+POLL_BACKOFF = 1.5
+POLL_MAX = 0.25
+# change gating compares frames downscaled by 2**GATE_LEVEL; the frame counts as changed when any
+# thumbnail pixel moved by more than GATE_THRESHOLD (a mean over the whole screen hides small dialogs)
+GATE_LEVEL = 3
+GATE_THRESHOLD = 8
+
+
+def frame_changed(prev: np.ndarray | None, cur: np.ndarray) -> bool:
+    """Compare two downscaled grayscale frames."""
+    if prev is None or prev.shape != cur.shape:
+        return True
+    return int(cv2.absdiff(prev, cur).max()) > GATE_THRESHOLD
+
+
+# the change stage compares search regions on the frame downscaled by 2**MEMO_LEVEL (4x4 pixel blocks;
+# a block counts as changed when its mean moved by more than GATE_THRESHOLD)
+MEMO_LEVEL = 2
+
+
+def lookup(tpl: Template, frame: Frame, hint: Sequence[float] | None, confidence: float, grayscale: bool,
+           method: str, levels: int, scales: Sequence[float] | None) -> Optional[Match]:
+    """One search for an image action: locate_scaled with scales, else locate_near."""
+    if scales:
+        return locate_scaled(tpl, frame, scales, hint, confidence, grayscale, method, levels)
+    return locate_near(tpl, frame, hint, confidence, grayscale, method=method, levels=levels)
+
+
+class MatchMemo:
+    """Change detection in front of the matcher.
+
+    Opt-in (wait_for(memo=True), "memo": true on an image action): a target that appears with
+    about the same brightness as what it covers may not register as a change, and is then not
+    matched until something else in its area changes.
+
+    For every template and search settings it keeps the last result plus a downscaled copy of
+    the part of the screen that result depended on: the matched rectangle if the template was
+    found, the whole frame if it was not. When that part is unchanged on a new frame, the
+    previous result is returned without matching. Bounded LRU of max_entries.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.skips = 0
+
+    @staticmethod
+    def _signature(frame: Frame, m: Optional[Match]) -> np.ndarray:
+        thumb = frame.level(MEMO_LEVEL, True)
+        if m is None:
+            return thumb
+        x0 = max(0, ((m.left - frame.left) >> MEMO_LEVEL) - 1)
+        y0 = max(0, ((m.top - frame.top) >> MEMO_LEVEL) - 1)
+        x1 = ((m.left - frame.left + m.width) >> MEMO_LEVEL) + 2
+        y1 = ((m.top - frame.top + m.height) >> MEMO_LEVEL) + 2
+        return thumb[y0:y1, x0:x1]
+
+    def locate(self, tpl: Template, frame: Frame, hint: Sequence[float] | None, confidence: float = 0.7,
+               grayscale: bool = False, method: str = "template", levels: int = 2,
+               scales: Sequence[float] | None = None) -> Tuple[Optional[Match], bool]:
+        """locate_near / locate_scaled behind the change check. Returns (match, reused)."""
+        key = (id(tpl), confidence, grayscale, method, levels, tuple(scales) if scales else None)
+        geometry = (frame.left, frame.top, frame.size)
+        with self._lock:
+            self.lookups += 1
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+        if entry is not None:
+            e_tpl, e_geometry, e_sig, e_match = entry
+            if e_tpl is tpl and e_geometry == geometry and not frame_changed(e_sig, self._signature(frame, e_match)):
+                with self._lock:
+                    self.skips += 1
+                if e_match is None:
+                    return None, True
+                return Match(e_match.left, e_match.top, e_match.width, e_match.height, e_match.score,
+                             e_match.scale), True
+        m = lookup(tpl, frame, hint, confidence, grayscale, method, levels, scales)
+        sig = self._signature(frame, m).copy()
+        with self._lock:
+            self._items[key] = (tpl, geometry, sig, m)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return m, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "skips": self.skips,
+                "skip_rate": (self.skips / self.lookups) if self.lookups else 0.0,
+                "entries": len(self._items),
+            }
+
+
+# shared by wait_for (every image action) and the trigger loop
+match_memo = MatchMemo()
+
+
+def wait_for(tpl: Template, capture, hint: Sequence[int] | None = None, timeout: float = 0.0,
+             confidence: float = 0.7, grayscale: bool = False, method: str = "template",
+             levels: int = 2, gate: bool = False, cancel=None, trace=None,
+             scales: Sequence[float] | None = None, memo: bool = False) -> Optional[Match]:
+    """Poll the screen until the template appears or timeout seconds pass.
+
+    capture is a SharedCapture. The first attempt uses the shared frame; later attempts take
+    fresh captures with an interval that starts at POLL_START and backs off to POLL_MAX.
+    With gate=True, matching is skipped for frames that did not change since the last attempt.
+    With memo=True every attempt goes through match_memo, which reuses the previous result for
+    this template when the screen region it depended on looks unchanged. timeout=0 means a
+    single attempt. cancel (a threading.Event) stops the wait early.
+    trace (tracing.ActionTrace) accumulates capture and match time and gets the result.
+    scales switches to multi-scale matching (see locate_scaled).
+    """
+    deadline = time.monotonic() + timeout
+    interval = POLL_START
+    t0 = time.perf_counter()
+    frame = capture.frame()
+    t_capture = time.perf_counter() - t0
+    t_match = 0.0
+    skipped = 0
+    prev = None
+    m = None
+    while True:
+        t0 = time.perf_counter()
+        thumb = frame.level(GATE_LEVEL, True) if gate else None
+        if gate and not frame_changed(prev, thumb):
+            reused = True
+        elif memo:
+            m, reused = match_memo.locate(tpl, frame, hint, confidence, grayscale, method, levels, scales)
+        else:
+            m, reused = lookup(tpl, frame, hint, confidence, grayscale, method, levels, scales), False
+        skipped += reused
+        t_match += time.perf_counter() - t0
+        if m is not None:
+            break
+        prev = thumb
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if cancel is not None:
+            if cancel.wait(min(interval, remaining)):
+                break
+        else:
+            time.sleep(min(interval, remaining))
+        interval = min(interval * POLL_BACKOFF, POLL_MAX)
+        t0 = time.perf_counter()
+        frame = capture.refresh()
+        t_capture += time.perf_counter() - t0
+    if trace is not None:
+        trace.capture += t_capture
+        trace.match += t_match
+        trace.skipped += skipped
+        trace.found = m is not None
+        if m is not None:
+            trace.score = m.score
+            trace.location = m.center
+    return m
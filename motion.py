@@ -0,0 +1,49 @@
+import random
+from typing import Callable, Dict, Tuple
+
+import pytweening
+
+
+class MotionProfile:
+    """How the mouse travels to a click target.
+
+    duration is a (min, max) range in seconds; a value is drawn per move. tweens are pytweening
+    curves, one is picked per move. pause=False skips pyautogui's PAUSE delay after the call.
+    """
+    __slots__ = ("name", "duration", "tweens", "pause")
+
+    def __init__(self, name: str, duration: Tuple[float, float], tweens: Tuple[Callable, ...] = (pytweening.linear,),
+                 pause: bool = True):
+        self.name = name
+        self.duration = duration
+        self.tweens = tweens
+        self.pause = pause
+
+    def move_args(self) -> Dict:
+        """Keyword arguments for pyautogui.moveTo/click."""
+        lo, hi = self.duration
+        d = lo if hi <= lo else random.uniform(lo, hi)
+        return {"duration": d, "tween": random.choice(self.tweens), "_pause": self.pause}
+
+
+PROFILES: Dict[str, MotionProfile] = {
+    # jump straight to the target, no animation and no post-call pause
+    "instant": MotionProfile("instant", (0.0, 0.0), pause=False),
+    "fast": MotionProfile("fast", (0.05, 0.1), (pytweening.easeOutQuad,), pause=False),
+    # the original 0.4 s linear move
+    "default": MotionProfile("default", (0.4, 0.4)),
+    "human": MotionProfile(
+        "human", (0.25, 0.6),
+        (pytweening.easeInOutQuad, pytweening.easeOutCubic, pytweening.easeInOutSine, pytweening.easeOutQuart),
+    ),
+}
+
+
+def get_profile(name: str | None) -> MotionProfile | None:
+    """Look up a profile by name. None means 'not set'."""
+    if name is None:
+        return None
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown motion profile: {name}") from None
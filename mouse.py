@@ -0,0 +1,94 @@
+import time
+
+from lazy import pyautogui as pyg
+from templates import Template, template_cache
+from capture import SharedCapture, shared_capture
+from matcher import wait_for
+from textinput import enter_text
+from motion import get_profile
+
+
+class MouseController:
+    """A class to control mouse actions using pyautogui."""
+    # screen source for image matching; swap the backend with capture.set_backend("mss" | "pyscreeze" | ...)
+    capture: SharedCapture = shared_capture
+
+    @staticmethod
+    def _motion_args(duration: float, motion) -> dict:
+        """pyautogui movement kwargs: from a motion profile (name or MotionProfile) if given, else duration."""
+        if motion is None:
+            return {"duration": duration}
+        if isinstance(motion, str):
+            motion = get_profile(motion)
+        return motion.move_args()
+
+    @staticmethod
+    def move_to(x: int, y: int, duration: float = 0.4, motion=None) -> None:
+        """Move the mouse to a specific (x, y) position."""
+        pyg.moveTo(x, y, **MouseController._motion_args(duration, motion))
+    
+    @staticmethod
+    def click(x: int, y: int, button: str = 'left', duration: float = 0.4, motion=None) -> None:
+        """Click at a specific (x, y) position, with specified button. motion overrides duration."""
+        if button not in ['left', 'right', 'middle']:
+            raise ValueError("Button must be 'left', 'right', or 'middle'")
+        pyg.click(x, y, button=button, **MouseController._motion_args(duration, motion))
+        # a click may change what is on screen
+        MouseController.capture.invalidate()
+        
+    @staticmethod
+    def image_click(img_pth: str, confidence: float = 0.7, duration: float = 0.4, hint=None,
+                    method: str = "template", levels: int = 2, timeout: float = 0.0, gate: bool = False,
+                    cancel=None, motion=None, scales=None, memo: bool = False):
+        """Find an image on the screen and click it. Returns the Match, or None if not found.
+
+        The template comes from the shared template cache and the screen capture is shared
+        with other image actions until it goes stale or a click/keystroke invalidates it.
+        hint is the last known (left, top) of the image; the area around it is searched first.
+        method 'pyramid' matches on a frame downscaled by 2**levels before confirming at full size.
+        With timeout > 0 the screen is polled (adaptive interval) until the image shows up;
+        gate skips matching on frames that did not change. cancel (threading.Event) aborts the wait.
+        motion is a motion profile name (see motion.PROFILES) used instead of duration.
+        scales (e.g. matcher.scale_set()) also tries resized variants of the image, for screens
+        with another DPI scale; hint may then carry the last matching scale as a third value.
+        memo reuses the previous result while the searched area looks unchanged (see matcher.MatchMemo).
+        """
+        tpl = template_cache.get(img_pth)
+        return MouseController.template_click(tpl, confidence, duration, hint, method, levels,
+                                              timeout, gate, cancel, motion=motion, scales=scales, memo=memo)
+
+    @staticmethod
+    def template_click(tpl: Template, confidence: float = 0.7, duration: float = 0.4, hint=None,
+                       method: str = "template", levels: int = 2, timeout: float = 0.0, gate: bool = False,
+                       cancel=None, trace=None, motion=None, scales=None, memo: bool = False):
+        """Same as image_click, for an already loaded template. trace collects timings (see tracing)."""
+        match = wait_for(tpl, MouseController.capture, hint, timeout=timeout, confidence=confidence,
+                         method=method, levels=levels, gate=gate, cancel=cancel, trace=trace, scales=scales,
+                         memo=memo)
+        if match:
+            x, y = match.center
+            t0 = time.perf_counter()
+            MouseController.click(x, y, duration=duration, motion=motion)
+            if trace is not None:
+                trace.input += time.perf_counter() - t0
+        else:
+            print(f"Image {tpl.path} not found on screen.")
+        return match
+
+    @staticmethod
+    def write_text(text: str, interval: float = 0.2, enter: bool = True, mode: str = "type",
+                   cps: float = 200.0, verify: str | None = None, cancel=None) -> bool:
+        """Enter text with the keyboard, optionally followed by Enter.
+
+        mode selects the input strategy (see textinput.INPUT_MODES); verify names a hook from
+        textinput.VERIFIERS. Returns False if verification failed or cancel was set while typing
+        (Enter is then not pressed).
+        """
+        try:
+            ok = enter_text(text, mode, interval=interval, cps=cps, verify=verify, cancel=cancel)
+            if ok and enter:
+                pyg.press("enter")
+            return ok
+        finally:
+            # typing may change what is on screen
+            MouseController.capture.invalidate()
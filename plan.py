@@ -0,0 +1,294 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from templates import Template, template_cache
+from tracing import ActionTrace
+from textinput import INPUT_MODES, VERIFIERS
+from motion import MotionProfile, PROFILES, get_profile
+from matcher import FEATURE_METHODS, SCALE_RANGE, scale_set
+from features import FEATURE_CONFIDENCE, MIN_TEMPLATE_KEYPOINTS, template_features
+
+
+class RunCancelled(Exception):
+    """Raised inside a run when its CancelToken was set."""
+
+
+class CancelToken(threading.Event):
+    """Cooperative cancellation flag handed to every run."""
+
+    def check(self) -> None:
+        """Raise RunCancelled if the run was cancelled."""
+        if self.is_set():
+            raise RunCancelled()
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep that wakes up (and raises RunCancelled) as soon as the run is cancelled."""
+        if seconds > 0 and self.wait(seconds):
+            raise RunCancelled()
+        self.check()
+
+
+class PlanError(ValueError):
+    """An action list that cannot be compiled. errors holds one message per bad action."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+# pause after an action when it doesn't set its own "delay"
+DEFAULT_DELAY = 0.35
+MATCH_METHODS = ("template", "pyramid", *FEATURE_METHODS)
+# mouse travel for image steps when neither the action nor the run sets a profile
+DEFAULT_MOTION = PROFILES["default"]
+
+# called as on_hit(step index, [left, top]) when an image is found somewhere new ([left, top, scale]
+# for multi-scale steps)
+HitCallback = Callable[[int, list], None]
+
+
+class ImageStep:
+    """Locate a preloaded template on screen and click it."""
+    kind = "image"
+    __slots__ = ("index", "name", "template", "confidence", "method", "levels", "timeout", "gate", "delay",
+                 "motion", "scales", "memo")
+
+    def __init__(self, index: int, name: str, template: Template, confidence: float, method: str,
+                 levels: int, timeout: float, gate: bool, delay: float, motion: MotionProfile | None = None,
+                 scales: Tuple[float, ...] | None = None, memo: bool = False):
+        self.index = index
+        self.name = name
+        self.template = template
+        self.confidence = confidence
+        self.method = method
+        self.levels = levels
+        self.timeout = timeout
+        self.gate = gate
+        self.delay = delay
+        self.motion = motion
+        # multi-scale matching; hits then hold [left, top, scale]
+        self.scales = scales
+        self.memo = memo
+
+    def run(self, mouse, token: CancelToken, hits: list, on_hit: HitCallback | None, trace=None,
+            motion: MotionProfile | None = None) -> None:
+        hint = hits[self.index]
+        match = mouse.template_click(self.template, self.confidence, hint=hint, method=self.method,
+                                     levels=self.levels, timeout=self.timeout, gate=self.gate,
+                                     cancel=token, trace=trace, motion=self.motion or motion or DEFAULT_MOTION,
+                                     scales=self.scales, memo=self.memo)
+        if not match:
+            return
+        hit = [match.left, match.top, match.scale] if self.scales else [match.left, match.top]
+        if hit != hint:
+            hits[self.index] = hit
+            if on_hit is not None:
+                on_hit(self.index, hits[self.index])
+
+
+class WriteStep:
+    """Enter a text (with the chosen input mode) followed by Enter."""
+    kind = "write"
+    __slots__ = ("index", "name", "text", "delay", "mode", "interval", "cps", "verify", "enter")
+
+    def __init__(self, index: int, name: str, text: str, delay: float, mode: str = "type",
+                 interval: float = 0.2, cps: float = 200.0, verify: str | None = None, enter: bool = True):
+        self.index = index
+        self.name = name
+        self.text = text
+        self.delay = delay
+        self.mode = mode
+        self.interval = interval
+        self.cps = cps
+        self.verify = verify
+        self.enter = enter
+
+    def run(self, mouse, token: CancelToken, hits: list, on_hit: HitCallback | None, trace=None,
+            motion: MotionProfile | None = None) -> None:
+        t0 = time.perf_counter()
+        ok = mouse.write_text(self.text, interval=self.interval, enter=self.enter, mode=self.mode,
+                              cps=self.cps, verify=self.verify, cancel=token)
+        if trace is not None:
+            trace.input += time.perf_counter() - t0
+        if not ok:
+            token.check()  # stopped part way: not a verification failure
+            raise RuntimeError("text verification failed")
+
+
+class Plan:
+    """An immutable, validated action sequence ready to run.
+
+    hits is the only mutable part: where each image step was last found (None if never).
+    """
+    __slots__ = ("steps", "hits")
+
+    def __init__(self, steps: Sequence, hits: List[Any]):
+        self.steps = tuple(steps)
+        self.hits = hits
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def run(self, mouse, token: CancelToken | None = None, on_hit: HitCallback | None = None,
+            traces: list | None = None, run_id: int = 0, motion: MotionProfile | None = None,
+            on_step: Callable[[int, str], None] | None = None) -> None:
+        """Execute all steps in order with mouse (a MouseController).
+
+        A failing step is reported and the run continues; cancellation stops it.
+        If traces is a list, one tracing.ActionTrace per executed step is appended to it.
+        motion is used by steps that don't set their own motion profile.
+        on_step(step index, name) is called as each step starts (progress reporting).
+        """
+        token = token or CancelToken()
+        for step in self.steps:
+            token.check()
+            if on_step is not None:
+                on_step(step.index, step.name)
+            trace = None
+            if traces is not None:
+                trace = ActionTrace(run_id, step.index, step.name, step.kind)
+                traces.append(trace)
+            t0 = time.perf_counter()
+            try:
+                step.run(mouse, token, self.hits, on_hit, trace, motion)
+                t1 = time.perf_counter()
+                try:
+                    token.sleep(step.delay)
+                finally:
+                    if trace is not None:
+                        trace.pacing = time.perf_counter() - t1
+            except RunCancelled:
+                raise
+            except Exception as e:
+                print(f"Error running action {step.name}:", e)
+                if trace is not None:
+                    trace.error = str(e)
+            finally:
+                if trace is not None:
+                    trace.total = time.perf_counter() - t0
+
+
+def _number(a: Dict[str, Any], key: str, default, cast, lo, hi, errors: List[str], label: str):
+    v = a.get(key, default)
+    try:
+        v = cast(v)
+    except (TypeError, ValueError):
+        errors.append(f"{label}: '{key}' must be a number, got {v!r}")
+        return default
+    if not lo <= v <= hi:
+        errors.append(f"{label}: '{key}' must be between {lo} and {hi}, got {v}")
+        return default
+    return v
+
+
+def _scales(a: Dict[str, Any], errors: List[str], label: str) -> Tuple[float, ...] | None:
+    # "scales": "auto" (from the detected screen scale) or an explicit list of template scales
+    v = a.get("scales")
+    if not v:
+        return None
+    if v == "auto" or v is True:
+        return scale_set()
+    lo, hi = SCALE_RANGE
+    try:
+        scales = tuple(round(float(s), 3) for s in v)
+    except (TypeError, ValueError):
+        errors.append(f"{label}: scales must be 'auto' or a list of numbers")
+        return None
+    if not all(lo <= s <= hi for s in scales):
+        errors.append(f"{label}: scales must be between {lo} and {hi}")
+        return None
+    return scales
+
+
+def compile_plan(actions: Sequence[Dict[str, Any]], cache=template_cache) -> Plan:
+    """Validate action dicts and turn them into a Plan, loading all templates up front.
+
+    Raises PlanError listing every problem found, so they can be shown when the button is created.
+    """
+    steps = []
+    hits: List[Any] = []
+    errors: List[str] = []
+    for i, a in enumerate(actions):
+        name = a.get("name") or f"Action {i + 1}"
+        label = f"{i + 1}. {name}"
+        a_type = a.get("type", "image")
+        param = a.get("param", "")
+        hits.append(a.get("last_hit"))
+        if a_type == "image":
+            if not param:
+                errors.append(f"{label}: image path is empty")
+                continue
+            if not os.path.exists(param):
+                errors.append(f"{label}: image file not found: {param}")
+                continue
+            try:
+                tpl = cache.get(param)
+            except Exception as e:
+                errors.append(f"{label}: {e}")
+                continue
+            method = a.get("match", "template")
+            if method not in MATCH_METHODS:
+                errors.append(f"{label}: unknown match method {method!r}")
+            timeout = _number(a, "timeout", 0.0, float, 0.0, 3600.0, errors, label)
+            # image actions that wait for their target need no fixed pause
+            default_delay = 0.0 if timeout > 0 else DEFAULT_DELAY
+            try:
+                motion = get_profile(a.get("motion") or None)
+            except ValueError as e:
+                errors.append(f"{label}: {e}")
+                motion = None
+            scales = _scales(a, errors, label)
+            default_confidence = 0.7
+            if method in FEATURE_METHODS:
+                default_confidence = FEATURE_CONFIDENCE
+                if scales:
+                    errors.append(f"{label}: 'scales' is not used with match {method!r} (keypoints are scale invariant)")
+                    scales = None
+                # describe the template now rather than on the first search
+                n = len(template_features(tpl, method))
+                if n < MIN_TEMPLATE_KEYPOINTS:
+                    errors.append(f"{label}: image has too little detail for match {method!r} "
+                                  f"({n} keypoints, need {MIN_TEMPLATE_KEYPOINTS}); "
+                                  f"use match 'template' or 'pyramid' instead")
+            if scales:
+                # resize every variant now rather than on the first miss
+                for s in scales:
+                    tpl.scaled(s)
+            steps.append(ImageStep(
+                i, name, tpl,
+                motion=motion,
+                scales=scales,
+                confidence=_number(a, "confidence", default_confidence, float, 0.0, 1.0, errors, label),
+                method=method,
+                levels=_number(a, "pyramid_levels", 2, int, 0, 6, errors, label),
+                timeout=timeout,
+                gate=bool(a.get("gate", False)),
+                memo=bool(a.get("memo", False)),
+                delay=_number(a, "delay", default_delay, float, 0.0, 3600.0, errors, label),
+            ))
+        elif a_type == "write":
+            if not param:
+                errors.append(f"{label}: text is empty")
+                continue
+            mode = a.get("input", "type")
+            if mode not in INPUT_MODES:
+                errors.append(f"{label}: unknown input mode {mode!r}")
+            verify = a.get("verify") or None
+            if verify is not None and verify not in VERIFIERS:
+                errors.append(f"{label}: unknown verify hook {verify!r}")
+            steps.append(WriteStep(
+                i, name, param,
+                delay=_number(a, "delay", DEFAULT_DELAY, float, 0.0, 3600.0, errors, label),
+                mode=mode,
+                interval=_number(a, "interval", 0.2, float, 0.0, 10.0, errors, label),
+                cps=_number(a, "cps", 200.0, float, 1.0, 100000.0, errors, label),
+                verify=verify,
+                enter=bool(a.get("enter", True)),
+            ))
+        else:
+            errors.append(f"{label}: unknown action type {a_type!r}")
+    if errors:
+        raise PlanError(errors)
+    return Plan(steps, hits)
@@ -0,0 +1,277 @@
+"""Replay a saved action sequence against recorded screen frames, offline.
+
+Frames are recorded by a live run (`runner.py --record DIR`): for every image action, the last
+screen it looked at is saved. Replaying runs the (possibly edited) actions file against those
+frames with pyautogui and pyperclip stubbed out and reports, per action, hit/miss, match score, the chosen
+click point and timing. Results can be stored as a baseline and later runs diffed against it.
+
+    python runner.py --record frames/                    # live run, saves frames/
+    python replay.py frames/ --save-baseline base.json   # replay and store the results
+    python replay.py frames/ --baseline base.json        # replay and diff; exit 1 on regressions
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+from typing import Any, Dict, List
+
+from capture import CaptureBackend, Frame
+from lazy import cv2, np
+
+MANIFEST = "manifest.json"
+# a found image whose click point moved further than this (pixels) counts as a regression
+MOVE_TOLERANCE = 2
+# score changes below this are not reported
+SCORE_TOLERANCE = 0.01
+# slower by more than this factor (and by at least SLOW_MIN_MS) is reported
+SLOW_FACTOR = 1.5
+SLOW_MIN_MS = 2.0
+
+
+class FrameRecorder(CaptureBackend):
+    """Capture backend wrapper that saves, for every image step, the last frame it looked at.
+
+    Install it in place of the live backend, pass on_step to Plan.run and call finish() when
+    the run is over. Frames are written as PNGs into directory with a manifest mapping each
+    action (by its index in the actions file) to its frame.
+    """
+    name = "recording"
+
+    def __init__(self, backend: CaptureBackend, directory: str, plan, indices: List[int] | None = None):
+        self.backend = backend
+        self.directory = directory
+        self.plan = plan
+        self.indices = indices
+        self.entries: List[Dict[str, Any]] = []
+        self._last: Frame | None = None
+        self._grabs = 0  # grab number of _last
+        self._step = None
+        self._saved: Dict[int, str] = {}  # grab number -> file, so a shared frame is written once
+        os.makedirs(directory, exist_ok=True)
+
+    def grab(self, region=None) -> Frame:
+        f = self.backend.grab(region)
+        self._last = f
+        self._grabs += 1
+        return f
+
+    def monitors(self):
+        return self.backend.monitors()
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def on_step(self, index: int, name: str) -> None:
+        self._save()
+        self._step = self.plan.steps[index]
+
+    def _save(self) -> None:
+        step, f = self._step, self._last
+        if step is None or step.kind != "image" or f is None:
+            return
+        index = self.indices[step.index] if self.indices else step.index
+        file = self._saved.get(self._grabs)
+        if file is None:
+            file = f"{index:03d}.png"
+            cv2.imwrite(os.path.join(self.directory, file), f.image)
+            self._saved[self._grabs] = file
+        self.entries = [e for e in self.entries if e["index"] != index]
+        self.entries.append({"index": index, "name": step.name, "file": file, "left": f.left, "top": f.top})
+
+    def finish(self) -> None:
+        self._save()
+        self._step = None
+        self._saved.clear()
+        with open(os.path.join(self.directory, MANIFEST), "w", encoding="utf-8") as fh:
+            json.dump({"frames": self.entries}, fh, indent=2)
+
+
+def load_frames(directory: str) -> Dict[int, Frame]:
+    """Recorded frames by action index."""
+    with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    frames = {}
+    for e in manifest["frames"]:
+        img = cv2.imdecode(np.fromfile(os.path.join(directory, e["file"]), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Could not decode recorded frame {e['file']}")
+        frames[e["index"]] = Frame(img, e.get("left", 0), e.get("top", 0))
+    return frames
+
+
+def replay(actions: List[Dict[str, Any]], indices: List[int], frames: Dict[int, Frame], runs: int = 3,
+           keep_timeouts: bool = False) -> List[Dict[str, Any]]:
+    """Run actions (file positions indices) against frames; one result dict per action.
+
+    Pauses are dropped and, unless keep_timeouts, so are image timeouts (a recorded frame never
+    changes, so waiting on it cannot help). Hit, score and location come from the first run;
+    timings are medians over runs, each starting from the hints stored in the actions file.
+    """
+    from capture import SharedCapture, SyntheticBackend
+    from matcher import locate, match_memo
+    from mouse import MouseController
+    from motion import get_profile
+    from plan import compile_plan
+
+    prepared = []
+    for a in actions:
+        a = dict(a, delay=0)
+        if not keep_timeouts:
+            a["timeout"] = 0
+        prepared.append(a)
+    plan = compile_plan(prepared)
+    initial_hits = list(plan.hits)
+    capture = MouseController.capture = SharedCapture(backend=SyntheticBackend())
+
+    def on_step(i: int, name: str) -> None:
+        # each image step sees only its own recorded frame (none: the step fails with an error)
+        if plan.steps[i].kind == "image":
+            f = frames.get(indices[i])
+            capture.set_backend(SyntheticBackend([f.image], origin=(f.left, f.top)) if f else SyntheticBackend())
+
+    first = None
+    timings: List[List[Dict[str, float]]] = []
+    for r in range(runs):
+        match_memo.clear()
+        plan.hits[:] = initial_hits
+        traces = []
+        plan.run(MouseController, on_step=on_step, traces=traces, run_id=r + 1, motion=get_profile("instant"))
+        if first is None:
+            first = traces
+        timings.append([{"match_ms": t.match * 1000, "total_ms": t.total * 1000} for t in traces])
+
+    results = []
+    for t in first:
+        idx = indices[t.index]
+        res = {"index": idx, "name": t.name, "type": t.type}
+        step = plan.steps[t.index]
+        if step.kind == "image":
+            f = frames.get(idx)
+            res["frame"] = f is not None
+            res["found"] = bool(t.found)
+            res["score"] = round(t.score, 4) if t.score is not None else None
+            res["location"] = list(t.location) if t.location is not None else None
+            if f is not None and not t.found:
+                # how close a miss was: the best score anywhere on the frame
+                best = locate(step.template, f, confidence=-1.0)
+                res["best_score"] = round(best.score, 4) if best is not None else None
+        for key in ("match_ms", "total_ms"):
+            res[key] = round(statistics.median(run[t.index][key] for run in timings), 3)
+        if t.error:
+            res["error"] = t.error
+        results.append(res)
+    return results
+
+
+def diff(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Differences against a baseline, one dict per change: {index, name, kind, detail, regression}."""
+    old = {(r["index"], r["name"]): r for r in baseline}
+    changes = []
+
+    def add(r, kind, detail, regression):
+        changes.append({"index": r["index"], "name": r["name"], "kind": kind, "detail": detail,
+                        "regression": regression})
+
+    for r in results:
+        o = old.pop((r["index"], r["name"]), None)
+        if o is None:
+            add(r, "new", "not in baseline", False)
+            continue
+        if r.get("error") and not o.get("error"):
+            add(r, "error", r["error"], True)
+        if r["type"] == "image":
+            if o.get("found") and not r.get("found"):
+                add(r, "miss", f"no longer found (best score {r.get('best_score')})", True)
+            elif r.get("found") and not o.get("found"):
+                add(r, "hit", f"now found at {r['location']} (score {r['score']})", False)
+            elif r.get("found"):
+                (x0, y0), (x1, y1) = o["location"], r["location"]
+                if max(abs(x1 - x0), abs(y1 - y0)) > MOVE_TOLERANCE:
+                    add(r, "moved", f"{o['location']} -> {r['location']}", True)
+                if abs(r["score"] - o["score"]) >= SCORE_TOLERANCE:
+                    add(r, "score", f"{o['score']} -> {r['score']}", False)
+        a, b = o.get("total_ms", 0.0), r.get("total_ms", 0.0)
+        if b > a * SLOW_FACTOR and b - a >= SLOW_MIN_MS:
+            add(r, "slower", f"{a:.2f} -> {b:.2f} ms", False)
+        elif a > b * SLOW_FACTOR and a - b >= SLOW_MIN_MS:
+            add(r, "faster", f"{a:.2f} -> {b:.2f} ms", False)
+    for (index, name) in old:
+        changes.append({"index": index, "name": name, "kind": "removed", "detail": "not replayed",
+                        "regression": False})
+    return changes
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Replay actions against recorded screen frames (offline).")
+    ap.add_argument("frames", help="directory recorded with runner.py --record")
+    ap.add_argument("-f", "--file", help="actions file (default: actions.json next to this script)")
+    ap.add_argument("--only", help="comma separated action names to replay (in file order)")
+    ap.add_argument("--from", dest="start", type=int, help="first action to replay (1-based)")
+    ap.add_argument("--to", dest="end", type=int, help="last action to replay (1-based, inclusive)")
+    ap.add_argument("-n", "--runs", type=int, default=3, help="runs to take median timings over")
+    ap.add_argument("--keep-timeouts", action="store_true", help="keep image action timeouts")
+    ap.add_argument("--threads", type=int, help="match threads for full screen searches (1 = no tiling)")
+    ap.add_argument("--out", help="write JSON results to this file")
+    ap.add_argument("--baseline", help="results JSON to diff against; exit 1 on regressions")
+    ap.add_argument("--save-baseline", metavar="FILE", help="store these results as a baseline")
+    args = ap.parse_args(argv)
+    if args.runs < 1:
+        ap.error("--runs must be at least 1")
+
+    # nothing may be clicked or typed; must happen before pyautogui is first used
+    from stubs import stub_input
+    stub_input()
+    from plan import PlanError
+    from runner import _select
+    from storage import load_actions
+
+    actions = load_actions(args.file)
+    indices, selected = _select(actions, args.only, args.start, args.end)
+    if not selected:
+        print("No actions to replay.", file=sys.stderr)
+        return 1
+    if args.threads is not None:
+        from matcher import tiled_matcher
+        tiled_matcher.set_threads(args.threads)
+    try:
+        frames = load_frames(args.frames)
+        results = replay(selected, indices, frames, args.runs, args.keep_timeouts)
+    except PlanError as e:
+        print("Invalid actions:", file=sys.stderr)
+        for err in e.errors:
+            print("  " + err, file=sys.stderr)
+        return 2
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Cannot read recorded frames in {args.frames}: {e}", file=sys.stderr)
+        return 2
+
+    data = {"frames": os.path.abspath(args.frames), "runs": args.runs, "results": results}
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            changes = diff(results, json.load(fh)["results"])
+        data["changes"] = changes
+        for c in changes:
+            mark = "!" if c["regression"] else " "
+            print(f"{mark} #{c['index'] + 1} {c['name']}: {c['kind']} — {c['detail']}", file=sys.stderr)
+        regressions = sum(c["regression"] for c in changes)
+        print(f"{len(changes)} changes, {regressions} regressions against {args.baseline}", file=sys.stderr)
+        status = 1 if regressions else 0
+    text = json.dumps(data, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    elif not args.save_baseline:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump({"frames": data["frames"], "runs": args.runs, "results": results}, fh, indent=2)
+    found = [r for r in results if r["type"] == "image"]
+    print(f"Replayed {len(results)} actions: {sum(r['found'] for r in found)}/{len(found)} images found",
+          file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Run a saved action sequence from the command line, without the GUI.
+
+    python runner.py                      # run every action in actions.json, top to bottom
+    python runner.py -f other.json --only "Login,Submit"
+    python runner.py --motion instant --backend mss
+    python runner.py --check              # only validate the sequence
+    python runner.py --repeat 500 --rate 2  # 500 iterations, one every 0.5 s
+    python runner.py --forever            # loop until Ctrl+C
+    python runner.py --when dialog.png    # run every time dialog.png appears, until Ctrl+C
+    python runner.py --record frames/     # save what each image action saw (see replay.py)
+
+Qt is never imported; OpenCV and pyautogui are only loaded when the first action needs them.
+"""
+import argparse
+import signal
+import sys
+import time
+
+
+def _select(actions, only: str | None, start: int | None, end: int | None):
+    """Subset of actions by name list or 1-based inclusive range. Returns (indices, actions)."""
+    idx = list(range(len(actions)))
+    if only:
+        names = {n.strip() for n in only.split(",") if n.strip()}
+        idx = [i for i in idx if actions[i].get("name") in names]
+    if start is not None or end is not None:
+        lo = (start or 1) - 1
+        hi = end if end is not None else len(actions)
+        idx = [i for i in idx if lo <= i < hi]
+    return idx, [actions[i] for i in idx]
+
+
+def _run_on_trigger(image: str, run_once, token, count: int | None, fps: float, stats) -> None:
+    """Call run_once each time image appears, until cancelled or count runs are done."""
+    import threading
+    from templates import template_cache
+    from triggers import Trigger, trigger_loop
+
+    fired = threading.Event()
+    trigger_loop.max_fps = fps
+    trigger = trigger_loop.arm(Trigger(image, template_cache.get(image), lambda t, m: fired.set()))
+    start = time.perf_counter()
+    try:
+        while count is None or stats.iterations < count:
+            # wake up regularly so Ctrl+C (which only sets token) is noticed
+            while not fired.wait(0.2):
+                token.check()
+            fired.clear()
+            t0 = time.perf_counter()
+            run_once(stats.iterations)
+            stats.times.add(time.perf_counter() - t0)
+            stats.iterations += 1
+    finally:
+        trigger_loop.disarm(trigger)
+        stats.elapsed = time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Run a saved action sequence headless (no GUI).")
+    ap.add_argument("-f", "--file", help="actions file (default: actions.json next to this script)")
+    ap.add_argument("--only", help="comma separated action names to run (in file order)")
+    ap.add_argument("--from", dest="start", type=int, help="first action to run (1-based)")
+    ap.add_argument("--to", dest="end", type=int, help="last action to run (1-based, inclusive)")
+    ap.add_argument("--backend", default="auto", help="capture backend: auto, mss or pyscreeze")
+    ap.add_argument("--motion", help="motion profile for image actions without their own")
+    ap.add_argument("--trace", help="write per-action timing traces (JSONL) to this file")
+    ap.add_argument("--save-hits", action="store_true", help="store where images were found back into the file")
+    ap.add_argument("--check", action="store_true", help="validate the sequence and exit")
+    ap.add_argument("--repeat", type=int, help="run the sequence this many times")
+    ap.add_argument("--for", dest="duration", type=float, help="repeat the sequence for this many seconds")
+    ap.add_argument("--forever", action="store_true", help="repeat the sequence until Ctrl+C")
+    ap.add_argument("--rate", type=float, help="target iterations per second when repeating")
+    ap.add_argument("--when", metavar="IMAGE", help="run each time IMAGE appears on screen (until Ctrl+C, "
+                                                   "or --repeat runs)")
+    ap.add_argument("--fps", type=float, default=5.0, help="screen checks per second for --when")
+    ap.add_argument("--threads", type=int, help="match threads for full screen searches (1 = no tiling)")
+    ap.add_argument("--tile-monitors", action="store_true", help="match one tile per monitor instead of bands")
+    ap.add_argument("--record", metavar="DIR", help="save the screen each image action looked at into DIR "
+                                                    "(for replay.py)")
+    args = ap.parse_args(argv)
+    if args.rate is not None and not (args.repeat or args.duration or args.forever):
+        ap.error("--rate needs --repeat, --for or --forever")
+
+    from storage import DEFAULT_PATH, ActionStore, load_actions
+    from plan import PlanError, RunCancelled, CancelToken, compile_plan
+    from bundle import TemplateBundle, bundle_path
+    from templates import template_cache
+
+    actions = load_actions(args.file)
+    # decoded templates shared (memory-mapped) with other runners, if the bundle is current
+    template_cache.use_bundle(TemplateBundle.open(bundle_path(args.file or DEFAULT_PATH)))
+    indices, selected = _select(actions, args.only, args.start, args.end)
+    if not selected:
+        print("No actions to run.", file=sys.stderr)
+        return 1
+    try:
+        plan = compile_plan(selected)
+    except PlanError as e:
+        print("Invalid actions:", file=sys.stderr)
+        for err in e.errors:
+            print("  " + err, file=sys.stderr)
+        return 2
+    if args.check:
+        print(f"OK: {len(plan)} actions")
+        return 0
+
+    from loop import LoopSpec, LoopStats, run_loop
+    from matcher import match_memo
+    from motion import get_profile
+    from mouse import MouseController
+
+    try:
+        motion = get_profile(args.motion)
+        spec = None
+        if args.repeat or args.duration or args.forever:
+            spec = LoopSpec(args.repeat, args.duration, args.rate)
+    except ValueError as e:
+        ap.error(str(e))
+    if args.backend != "auto":
+        MouseController.capture.set_backend(args.backend)
+    if args.threads is not None or args.tile_monitors:
+        from matcher import tiled_matcher
+        try:
+            if args.threads is not None:
+                tiled_matcher.set_threads(args.threads)
+        except ValueError as e:
+            ap.error(str(e))
+        if args.tile_monitors:
+            tiled_matcher.use_monitors(MouseController.capture.backend.monitors())
+
+    token = CancelToken()
+    signal.signal(signal.SIGINT, lambda *_: token.set())
+
+    store = None
+    on_hit = None
+    if args.save_hits:
+        store = ActionStore(args.file, debounce=0.5)
+        store.load()
+        on_hit = lambda i, hit: store.update(indices[i], last_hit=list(hit))  # noqa: E731
+
+    writer = None
+    if args.trace:
+        from tracing import TraceWriter
+        writer = TraceWriter(args.trace)
+
+    recorder = None
+    if args.record:
+        from capture import create_backend
+        from replay import FrameRecorder
+        recorder = FrameRecorder(create_backend(args.backend), args.record, plan, indices)
+        MouseController.capture.set_backend(recorder)
+
+    def run_once(iteration: int) -> None:
+        traces = [] if writer is not None else None
+        try:
+            plan.run(MouseController, token, on_hit=on_hit, traces=traces, run_id=iteration + 1, motion=motion,
+                     on_step=recorder.on_step if recorder is not None else None)
+        finally:
+            if traces:
+                writer.write([t.to_dict() for t in traces])
+            if recorder is not None:
+                recorder.finish()
+
+    stats = LoopStats()
+    t0 = time.perf_counter()
+    status = 0
+    try:
+        if args.when:
+            _run_on_trigger(args.when, run_once, token, args.repeat, args.fps, stats)
+        elif spec is None:
+            run_once(0)
+        else:
+            run_loop(run_once, spec, token, stats=stats)
+    except RunCancelled:
+        print("Stopped.", file=sys.stderr)
+        status = 130
+    finally:
+        if store is not None:
+            store.close()
+    if args.when:
+        print(f"Ran {len(plan)} actions when {args.when} appeared: {stats.summary()}", file=sys.stderr)
+    elif spec is None:
+        print(f"Ran {len(plan)} actions in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    else:
+        print(f"Ran {len(plan)} actions {spec.describe()}: {stats.summary()}", file=sys.stderr)
+    memo = match_memo.stats()
+    if memo["lookups"]:
+        print(f"Matches skipped on unchanged screen: {memo['skips']}/{memo['lookups']} "
+              f"({memo['skip_rate']:.0%})", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
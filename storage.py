@@ -1,37 +1,125 @@
 import json
 import os
+import hashlib
 import tempfile
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple
+
+from bundle import TemplateBundle, bundle_path, write_bundle
+from templates import template_cache
 
 DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "actions.json")
+JOURNAL_SUFFIX = ".journal"
 
 
-def load_actions(path: str | None = None) -> List[Dict[str, Any]]:
-    """Load list of action dicts from JSON file. Returns empty list if file missing or invalid."""
-    p = path or DEFAULT_PATH
+def _read_main(p: str) -> Tuple[List[Dict[str, Any]], str | None]:
+    """Return (actions, sha1 of file contents). sha1 is None if the file is missing."""
     if not os.path.exists(p):
-        return []
+        return [], None
     try:
-        with open(p, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
+        with open(p, "rb") as fh:
+            raw = fh.read()
+        digest = hashlib.sha1(raw).hexdigest()
+    except OSError:
+        return [], None
+    try:
+        data = json.loads(raw.decode("utf-8"))
         if isinstance(data, list):
-            return data
+            return data, digest
     except Exception:
         pass
-    return []
+    return [], digest
 
 
-def save_actions(actions: List[Dict[str, Any]], path: str | None = None) -> None:
-    """Atomically save actions (list of dicts) to JSON file."""
+def apply_op(actions: List[Dict[str, Any]], rec: Dict[str, Any]) -> None:
+    """Apply one journal record to an action list in place."""
+    op = rec.get("op")
+    if op == "add":
+        actions.insert(rec.get("index", len(actions)), rec["action"])
+    elif op == "remove":
+        del actions[rec["index"]]
+    elif op == "move":
+        actions.insert(rec["dst"], actions.pop(rec["src"]))
+    elif op == "update":
+        actions[rec["index"]].update(rec["fields"])
+    elif op == "replace":
+        actions[:] = rec["actions"]
+    else:
+        raise ValueError(f"Unknown journal op: {op}")
+
+
+def _replay_journal(p: str, actions: List[Dict[str, Any]], base: str | None) -> int:
+    """Apply the journal of p on top of actions. Returns number of records applied.
+
+    The first journal line names the sha1 of the main file it applies to; a journal written
+    for another version of the main file (e.g. one that was already compacted) is ignored.
+    The exception is a checkpoint record, appended by a compaction before it replaces the
+    main file: when the main file is the one the checkpoint names, only the records from the
+    checkpoint's offset on are applied. A torn last line from a crash is skipped.
+    """
+    jp = p + JOURNAL_SUFFIX
+    if not os.path.exists(jp):
+        return 0
+    records = []
+    try:
+        with open(jp, "rb") as fh:
+            header = fh.readline()
+            try:
+                journal_base = json.loads(header.decode("utf-8")).get("base")
+            except Exception:
+                return 0
+            offset = fh.tell()
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    break  # incomplete write
+                try:
+                    records.append((offset, json.loads(raw.decode("utf-8"))))
+                except Exception as e:
+                    print("Skipping bad journal record:", e)
+                offset += len(raw)
+    except OSError:
+        return 0
+    start = None
+    if journal_base == base:
+        start = 0
+    else:
+        for _, rec in records:
+            if rec.get("op") == "checkpoint" and rec.get("base") == base:
+                start = rec["offset"]
+    if start is None:
+        return 0
+    n = 0
+    for offset, rec in records:
+        if offset < start or rec.get("op") == "checkpoint":
+            continue
+        try:
+            apply_op(actions, rec)
+        except Exception as e:
+            print("Skipping bad journal record:", e)
+            continue
+        n += 1
+    return n
+
+
+def load_actions(path: str | None = None) -> List[Dict[str, Any]]:
+    """Load list of action dicts from JSON file, replaying any pending journal.
+
+    Returns empty list if file missing or invalid.
+    """
     p = path or DEFAULT_PATH
+    actions, digest = _read_main(p)
+    _replay_journal(p, actions, digest)
+    return actions
+
+
+def _atomic_write(p: str, data: bytes) -> None:
     d = os.path.dirname(p)
     if d and not os.path.exists(d):
         os.makedirs(d, exist_ok=True)
-    # atomic write
-    fd, tmp = tempfile.mkstemp(dir=d or ".", prefix=".tmp_actions_", text=True)
+    fd, tmp = tempfile.mkstemp(dir=d or ".", prefix=".tmp_actions_")
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as fh:
-            json.dump(actions, fh, ensure_ascii=False, indent=2)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
             fh.flush()
             os.fsync(fh.fileno())
         os.replace(tmp, p)
@@ -40,4 +128,206 @@ def save_actions(actions: List[Dict[str, Any]], path: str | None = None) -> None
             try:
                 os.remove(tmp)
             except Exception:
-                pass
\ No newline at end of file
+                pass
+
+
+def _dump(actions: List[Dict[str, Any]]) -> bytes:
+    return json.dumps(actions, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _save_bundle(actions: List[Dict[str, Any]], path: str) -> None:
+    """Refresh the template bundle next to path (a no-op when its images are unchanged)."""
+    bp = bundle_path(path)
+    try:
+        written = write_bundle(actions, bp)
+    except Exception as e:
+        print("Could not write template bundle:", e)
+        return
+    # serve this process's templates from the bundle just saved (also one that didn't exist at
+    # startup); worker processes re-attach it before their next run
+    if written or template_cache.bundle is None:
+        bundle = TemplateBundle.open(bp)
+        if bundle is not None:
+            template_cache.use_bundle(bundle)
+
+
+def save_actions(actions: List[Dict[str, Any]], path: str | None = None) -> None:
+    """Atomically save actions (list of dicts) to JSON file, plus the pre-decoded template bundle."""
+    p = path or DEFAULT_PATH
+    _atomic_write(p, _dump(actions))
+    _save_bundle(actions, p)
+
+
+class ActionStore:
+    """Action list persisted through an append-only journal.
+
+    Every edit appends one small record to <path>.journal, so adds, removes and reorders cost
+    O(1) I/O. A background writer compacts the list into the main file once edits have been
+    quiet for debounce seconds. load_actions() replays the journal, so nothing is lost if the
+    app stops before compaction.
+    """
+    def __init__(self, path: str | None = None, debounce: float = 1.0):
+        self.path = path or DEFAULT_PATH
+        self.journal_path = self.path + JOURNAL_SUFFIX
+        self.debounce = debounce
+        self.actions: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # one compaction at a time; edits don't wait for it
+        self._wake = threading.Condition(self._lock)
+        self._journal = None
+        self._seq = 0           # number of edits made so far
+        self._compacted = 0     # edits already contained in the main file
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="action-store", daemon=True)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load actions (recovering from the journal) and start the background writer."""
+        with self._lock:
+            actions, digest = _read_main(self.path)
+            replayed = _replay_journal(self.path, actions, digest)
+            self.actions = actions
+            if not replayed:
+                self._open_journal(digest)
+        if replayed:
+            # fold recovered edits into the main file before starting a new journal
+            self.flush()
+        self._writer.start()
+        return self.actions
+
+    # --- edits -------------------------------------------------------------------------
+
+    def add(self, action: Dict[str, Any]) -> None:
+        self._record({"op": "add", "index": len(self.actions), "action": action})
+
+    def remove(self, index: int) -> None:
+        self._record({"op": "remove", "index": index})
+
+    def move(self, src: int, dst: int) -> None:
+        self._record({"op": "move", "src": src, "dst": dst})
+
+    def update(self, index: int, **fields) -> None:
+        self._record({"op": "update", "index": index, "fields": fields})
+
+    def replace(self, actions: List[Dict[str, Any]]) -> None:
+        self._record({"op": "replace", "actions": actions})
+
+    def _record(self, rec: Dict[str, Any]) -> None:
+        with self._lock:
+            apply_op(self.actions, rec)
+            self._seq += 1
+            self._append(rec)
+        self._schedule()
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        # caller holds self._lock
+        if self._journal is None:
+            return
+        try:
+            self._journal.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._journal.flush()
+        except OSError as e:
+            print("Could not append to journal:", e)
+
+    # --- compaction ----------------------------------------------------------------------
+
+    def _open_journal(self, base: str | None, records: List[str] = ()) -> None:
+        """Start a journal for the main file whose sha1 is base, holding records (JSON lines)."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        header = json.dumps({"base": base}) + "\n"
+        try:
+            _atomic_write(self.journal_path, (header + "".join(records)).encode("utf-8"))
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        except OSError as e:
+            print("Could not open journal:", e)
+
+    def _schedule(self) -> None:
+        with self._wake:
+            self._wake.notify()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._wake:
+                while not self._closed and self._seq == self._compacted:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                # debounce: wait until no edit arrived for self.debounce seconds
+                seen = self._seq
+                while not self._closed:
+                    self._wake.wait(self.debounce)
+                    if self._seq == seen:
+                        break
+                    seen = self._seq
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the current list into the main file now and truncate the journal.
+
+        Only taking the snapshot holds the edit lock; serializing, writing and fsyncing happen
+        outside it, so edits keep going. Before the main file is replaced, a checkpoint record
+        naming the new file and the journal offset of the snapshot is appended, so a crash at
+        any point still recovers the edits made after the snapshot. Afterwards the journal is
+        restarted with just those edits.
+        """
+        with self._flush_lock:
+            with self._lock:
+                # dicts are copied because update() changes them in place; nothing nests deeper
+                snapshot = [dict(a) for a in self.actions]
+                seq = self._seq
+                offset = self._journal_offset()
+            data = _dump(snapshot)
+            digest = hashlib.sha1(data).hexdigest()
+            if offset is not None:
+                with self._lock:
+                    self._append({"op": "checkpoint", "base": digest, "offset": offset})
+            try:
+                _atomic_write(self.path, data)
+            except OSError as e:
+                print("Could not save actions:", e)
+                return
+            with self._lock:
+                self._compacted = seq
+                self._open_journal(digest, self._journal_tail(offset))
+            images = [a for a in snapshot if a.get("type", "image") == "image"]
+            # outside the lock: decoding new images must not hold up edits
+            _save_bundle(images, self.path)
+
+    def _journal_offset(self) -> int | None:
+        # caller holds self._lock; byte offset where the next record will be written
+        if self._journal is None:
+            return None
+        try:
+            self._journal.flush()
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return None
+
+    def _journal_tail(self, offset: int | None) -> List[str]:
+        # caller holds self._lock; records appended since offset (checkpoints dropped)
+        if offset is None:
+            return []
+        try:
+            self._journal.flush()
+            with open(self.journal_path, "rb") as fh:
+                fh.seek(offset)
+                lines = [raw.decode("utf-8") for raw in fh if raw.endswith(b"\n")]
+        except (OSError, AttributeError):
+            return []
+        return [ln for ln in lines if json.loads(ln).get("op") != "checkpoint"]
+
+    def close(self) -> None:
+        """Flush pending edits and stop the background writer."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+            dirty = self._seq != self._compacted
+        if dirty:
+            self.flush()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
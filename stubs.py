@@ -0,0 +1,40 @@
+import sys
+import types
+
+# pyautogui functions the app calls; the stubs accept any arguments and do nothing
+INPUT_FUNCTIONS = ("click", "moveTo", "write", "press", "hotkey", "typewrite", "keyDown", "keyUp")
+
+
+def stub_pyautogui() -> types.ModuleType:
+    """Install a pyautogui that clicks and types nothing. Returns the stub module."""
+    stub = types.ModuleType("pyautogui")
+    stub.FAILSAFE = False
+    stub.PAUSE = 0.0
+    for fn in INPUT_FUNCTIONS:
+        setattr(stub, fn, lambda *a, **k: None)
+    stub.size = lambda: (0, 0)
+    sys.modules["pyautogui"] = stub
+    return stub
+
+
+def stub_pyperclip() -> types.ModuleType:
+    """Install a pyperclip backed by an in-memory clipboard. Returns the stub module."""
+    stub = types.ModuleType("pyperclip")
+    clipboard = [""]
+
+    def copy(text) -> None:
+        clipboard[0] = str(text)
+
+    stub.copy = copy
+    stub.paste = lambda: clipboard[0]
+    sys.modules["pyperclip"] = stub
+    return stub
+
+
+def stub_input() -> None:
+    """Stub out keyboard, mouse and clipboard for headless runs (bench, replay).
+
+    Must run before pyautogui and pyperclip are first used (they are imported lazily).
+    """
+    stub_pyautogui()
+    stub_pyperclip()
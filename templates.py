@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple, Any
+
+from lazy import cv2, np
+
+
+class Template:
+    """A decoded template image, kept in both color (BGR) and grayscale form."""
+    __slots__ = ("path", "key", "color", "gray", "nbytes", "_levels", "_scaled", "_features")
+
+    def __init__(self, path: str, key: Tuple[str, int, int], color: np.ndarray, gray: np.ndarray):
+        self.path = path
+        self.key = key
+        self.color = color
+        self.gray = gray
+        self.nbytes = int(color.nbytes + gray.nbytes)
+        self._levels: Dict[Tuple[int, bool], np.ndarray] = {}
+        self._scaled: Dict[float, Template] = {}
+        # keypoints per feature method (see features.template_features)
+        self._features: Dict[str, Any] = {}
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the template in pixels."""
+        h, w = self.gray.shape[:2]
+        return w, h
+
+    def level(self, level: int, grayscale: bool = False) -> np.ndarray:
+        """Template downscaled by 2**level for pyramid matching, computed once."""
+        src = self.gray if grayscale else self.color
+        if level <= 0:
+            return src
+        arr = self._levels.get((level, grayscale))
+        if arr is None:
+            arr = downscale(src, level)
+            self._levels[(level, grayscale)] = arr
+        return arr
+
+    def scaled(self, scale: float) -> Template:
+        """The template resized by scale (for screens with a different DPI scale), computed once per scale."""
+        scale = round(scale, 3)
+        if scale == 1.0:
+            return self
+        tpl = self._scaled.get(scale)
+        if tpl is None:
+            interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+            color = cv2.resize(self.color, None, fx=scale, fy=scale, interpolation=interp)
+            tpl = Template(self.path, self.key, color, cv2.cvtColor(color, cv2.COLOR_BGR2GRAY))
+            self._scaled[scale] = tpl
+        return tpl
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    """Cache key for a template file: absolute path + mtime + size."""
+    ap = os.path.abspath(path)
+    st = os.stat(ap)
+    return ap, st.st_mtime_ns, st.st_size
+
+
+def downscale(img: np.ndarray, level: int) -> np.ndarray:
+    """Shrink an image by a factor of 2**level (area interpolation)."""
+    f = 1.0 / (1 << level)
+    return cv2.resize(img, None, fx=f, fy=f, interpolation=cv2.INTER_AREA)
+
+
+def decode_image(path: str) -> np.ndarray:
+    """Read an image file into a BGR array. Works with non-ascii paths on Windows."""
+    buf = np.fromfile(path, dtype=np.uint8)
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Could not decode image: {path}")
+    return img
+
+
+class TemplateCache:
+    """LRU cache of decoded templates keyed by (path, mtime, size), bounded by memory.
+
+    A template whose file changed on disk (different mtime or size) is reloaded on next access.
+    With a bundle attached (see use_bundle), misses are served from its pre-decoded,
+    memory-mapped arrays when the file content still matches, instead of decoding the image.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Template]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bundle = None
+        self.bundle_hits = 0
+
+    def use_bundle(self, bundle) -> None:
+        """Serve misses from a bundle.TemplateBundle (None to stop)."""
+        self.bundle = bundle
+
+    def get(self, path: str) -> Template:
+        """Return the decoded template for path, loading it on a miss."""
+        key = _file_key(path)
+        ap = key[0]
+        with self._lock:
+            tpl = self._items.get(ap)
+            if tpl is not None and tpl.key == key:
+                self._items.move_to_end(ap)
+                self.hits += 1
+                return tpl
+            self.misses += 1
+
+        # decode outside the lock so other threads are not blocked on disk I/O
+        bundled = self.bundle.get(ap) if self.bundle is not None else None
+        if bundled is not None:
+            color, gray = bundled
+            self.bundle_hits += 1
+        else:
+            color = decode_image(ap)
+            gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+        tpl = Template(path, key, color, gray)
+
+        with self._lock:
+            old = self._items.pop(ap, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._items[ap] = tpl
+            self._bytes += tpl.nbytes
+            self._evict()
+        return tpl
+
+    def warm(self, paths: Iterable[str]) -> int:
+        """Preload templates. Returns number of templates successfully loaded."""
+        n = 0
+        for p in paths:
+            if not p:
+                continue
+            try:
+                self.get(p)
+                n += 1
+            except Exception as e:
+                print(f"Could not preload template {p}: {e}")
+        return n
+
+    def _evict(self) -> None:
+        # always keep the most recently used entry, even if it alone exceeds the cap
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, tpl = self._items.popitem(last=False)
+            self._bytes -= tpl.nbytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current memory usage."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bundle_hits": self.bundle_hits,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# shared cache used by MouseController and the floating buttons
+template_cache = TemplateCache()
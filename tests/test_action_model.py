@@ -0,0 +1,66 @@
+from PySide6.QtCore import QObject, Signal
+
+from action_model import ActionListModel
+from storage import ActionStore
+
+
+class Thumbs(QObject):
+    ready = Signal(str)
+    size = 16
+
+
+def _image(name, path):
+    return {"name": name, "type": "image", "param": path}
+
+
+def _model(tmp_path, actions):
+    store = ActionStore(str(tmp_path / "actions.json"), debounce=60)
+    store.load()
+    for a in actions:
+        store.add(a)
+    thumbs = Thumbs()
+    model = ActionListModel(store, thumbnails=thumbs)
+    changed = []
+    model.dataChanged.connect(lambda top, bottom, roles: changed.append(top.row()))
+    return model, thumbs, changed, store
+
+
+def test_thumbnail_updates_only_rows_showing_it(tmp_path):
+    model, thumbs, changed, store = _model(tmp_path, [_image("a", "x.png"), _image("b", "y.png"),
+                                                      _image("c", "x.png")])
+    thumbs.ready.emit("x.png")
+    assert changed == [0, 2]
+    changed.clear()
+    thumbs.ready.emit("unknown.png")
+    assert changed == []
+    store.close()
+
+
+def test_path_index_follows_edits(tmp_path):
+    model, thumbs, changed, store = _model(tmp_path, [_image("a", "x.png"), _image("b", "y.png"),
+                                                      _image("c", "z.png")])
+    model.move_rows([0], 1)            # b a c
+    model.append(_image("d", "x.png"))  # b a c d
+    model.remove_rows([2])             # b a d
+    model.update_action(0, param="x.png")
+    changed.clear()
+    thumbs.ready.emit("x.png")
+    assert changed == [0, 1, 2]
+    changed.clear()
+    model.set_filter("a [")            # only a
+    thumbs.ready.emit("x.png")
+    assert changed == [0]
+    store.close()
+
+
+def test_source_of_finds_actions_by_identity(tmp_path):
+    model, thumbs, changed, store = _model(tmp_path, [_image("a", "x.png"), _image("b", "x.png"),
+                                                      _image("c", "y.png")])
+    b = store.actions[1]
+    assert model.source_of(b) == 1
+    model.move_rows([1], -1)
+    assert model.source_of(b) == 0
+    assert model.source_of(_image("b", "x.png")) == -1  # equal, but not the stored dict
+    model.remove_rows([0])
+    assert model.source_of(b) == -1
+    store.close()
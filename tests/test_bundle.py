@@ -0,0 +1,70 @@
+import os
+
+import cv2
+import numpy as np
+
+import storage
+from bundle import TemplateBundle, bundle_path, write_bundle
+from templates import template_cache
+
+
+def _image(path, value):
+    img = np.full((12, 16, 3), value, dtype=np.uint8)
+    img[3:9, 4:12] = 255 - value
+    cv2.imwrite(path, img)
+    return img
+
+
+def _actions(*paths):
+    return [{"type": "image", "name": f"a{i}", "param": p} for i, p in enumerate(paths)]
+
+
+def test_unchanged_bundle_is_not_rewritten(tmp_path):
+    img = str(tmp_path / "a.png")
+    _image(img, 10)
+    path = str(tmp_path / "actions.json.templates")
+    assert write_bundle(_actions(img), path)
+    assert not write_bundle(_actions(img), path)
+
+
+def test_rewrite_while_the_old_bundle_is_mapped(tmp_path):
+    img = str(tmp_path / "a.png")
+    first = _image(img, 10)
+    path = str(tmp_path / "actions.json.templates")
+    write_bundle(_actions(img), path)
+    old = TemplateBundle.open(path)
+    assert np.array_equal(old.get(img)[0], first)
+
+    second = _image(img, 200)
+    assert write_bundle(_actions(img), path)
+    new = TemplateBundle.open(path)
+    assert new.data_path != old.data_path
+    assert np.array_equal(new.get(img)[0], second)
+    # the old mapping stays readable; its entry no longer matches the file
+    assert old.get(img) is None
+    assert np.asarray(old._data).size > 0
+
+
+def test_stale_data_files_are_removed(tmp_path):
+    img = str(tmp_path / "a.png")
+    path = str(tmp_path / "actions.json.templates")
+    for value in (10, 80, 150):
+        _image(img, value)
+        write_bundle(_actions(img), path)
+    data = [n for n in os.listdir(tmp_path) if n.startswith("actions.json.templates.")]
+    assert data == [os.path.basename(TemplateBundle.open(path).data_path)]
+
+
+def test_save_attaches_a_bundle_that_appears_after_startup(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_cache, "bundle", None)
+    img = str(tmp_path / "a.png")
+    first = _image(img, 10)
+    path = str(tmp_path / "actions.json")
+    storage.save_actions([], path)
+    assert template_cache.bundle is None
+    storage.save_actions(_actions(img), path)
+    assert template_cache.bundle is not None and template_cache.bundle.path == bundle_path(path)
+    assert np.array_equal(template_cache.bundle.get(img)[0], first)
+    second = _image(img, 200)
+    storage.save_actions(_actions(img), path)
+    assert np.array_equal(template_cache.bundle.get(img)[0], second)
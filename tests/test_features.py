@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+import pytest
+
+import features
+from capture import Frame
+from plan import PlanError, compile_plan
+
+
+def _screen(seed=3):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (30, 40), dtype=np.uint8)
+    return cv2.cvtColor(cv2.resize(small, (640, 480), interpolation=cv2.INTER_NEAREST), cv2.COLOR_GRAY2BGR)
+
+
+def test_akaze_frame_keeps_only_the_strongest_keypoints(monkeypatch):
+    monkeypatch.setattr(features, "FRAME_FEATURES", 100)
+    gray = cv2.cvtColor(_screen(), cv2.COLOR_BGR2GRAY)
+    detected = features._detector("akaze", True).detect(gray, None)
+    assert len(detected) > 100
+    f = features.frame_features(Frame(_screen()), "akaze")
+    assert len(f) == 100
+    weakest_kept = sorted(kp.response for kp in detected)[-100]
+    strongest = {kp.pt for kp in detected if kp.response >= weakest_kept}
+    assert {tuple(p) for p in f.points.tolist()} <= strongest
+
+
+def test_template_with_too_few_keypoints_is_rejected(tmp_path):
+    img = np.full((40, 60, 3), 200, dtype=np.uint8)
+    cv2.rectangle(img, (10, 10), (30, 25), (0, 0, 0), -1)
+    path = str(tmp_path / "flat.png")
+    cv2.imwrite(path, img)
+    with pytest.raises(PlanError) as e:
+        compile_plan([{"name": "flat", "type": "image", "param": path, "match": "orb"}])
+    assert any("use match 'template' or 'pyramid'" in err for err in e.value.errors)
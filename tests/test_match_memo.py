@@ -0,0 +1,43 @@
+import numpy as np
+
+from capture import SharedCapture, SyntheticBackend
+from matcher import locate, match_memo, wait_for
+from templates import Template
+
+
+def _template(img):
+    import cv2
+    return Template("faint.png", ("faint.png", 0, 0), img, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+def _faint_scene():
+    """A flat gray screen, then the same screen with a low-contrast checkerboard button on it."""
+    before = np.full((240, 320, 3), 128, np.uint8)
+    patch = np.full((24, 24, 3), 128, np.uint8)
+    patch[::2, ::2] = 131
+    patch[1::2, 1::2] = 125  # same mean as the background: block means don't move
+    after = before.copy()
+    after[100:124, 150:174] = patch
+    return before, after, _template(patch)
+
+
+def test_wait_for_finds_faint_target_without_memo():
+    before, after, tpl = _faint_scene()
+    assert locate(tpl, SyntheticBackend([after]).grab(), 0.9) is not None
+    match_memo.clear()
+    capture = SharedCapture(max_age=0, backend=SyntheticBackend([before] * 3 + [after]))
+    m = wait_for(tpl, capture, timeout=0.5, confidence=0.9)
+    assert m is not None and (m.left, m.top) == (150, 100)
+
+
+def test_memo_is_opt_in_and_skips_unchanged_screens():
+    before, after, tpl = _faint_scene()
+    match_memo.clear()
+    stats = match_memo.stats()
+    capture = SharedCapture(max_age=0, backend=SyntheticBackend([before]))
+    assert wait_for(tpl, capture, timeout=0.2, confidence=0.9) is None
+    assert match_memo.stats()["lookups"] == stats["lookups"]
+    assert wait_for(tpl, capture, timeout=0.2, confidence=0.9, memo=True) is None
+    after_stats = match_memo.stats()
+    assert after_stats["lookups"] > stats["lookups"] + 1
+    assert after_stats["skips"] >= after_stats["lookups"] - stats["lookups"] - 1
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+
+from capture import Frame
+from replay import FrameRecorder
+
+
+class Backend:
+    """Hands out one new frame object per grab; ids of dropped frames get reused."""
+    def __init__(self):
+        self.value = 0
+
+    def grab(self, region=None):
+        self.value += 40
+        return Frame(np.full((4, 4, 3), self.value, dtype=np.uint8))
+
+
+class Step:
+    kind = "image"
+
+    def __init__(self, index):
+        self.index = index
+        self.name = f"s{index}"
+
+
+class Plan:
+    steps = [Step(0), Step(1), Step(2)]
+
+
+def test_each_grab_is_saved_separately(tmp_path):
+    rec = FrameRecorder(Backend(), str(tmp_path), Plan())
+    rec.on_step(0, "s0")
+    rec.grab()
+    rec.on_step(1, "s1")
+    rec.grab()                # the first frame may be freed; its id can come back
+    rec.on_step(2, "s2")      # no new grab: shares step 1's frame
+    rec.finish()
+    entries = json.loads((tmp_path / "manifest.json").read_text())["frames"]
+    assert [e["file"] for e in entries] == ["000.png", "001.png", "001.png"]
+    assert rec._saved == {}
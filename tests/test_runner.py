@@ -0,0 +1,10 @@
+import pytest
+
+import runner
+
+
+def test_rate_without_a_loop_is_an_error(capsys):
+    with pytest.raises(SystemExit) as e:
+        runner.main(["--rate", "2", "--check"])
+    assert e.value.code == 2
+    assert "--rate needs --repeat, --for or --forever" in capsys.readouterr().err
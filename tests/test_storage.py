@@ -0,0 +1,107 @@
+import json
+import threading
+
+import storage
+from storage import ActionStore, load_actions
+
+
+def _store(tmp_path, actions=None):
+    path = str(tmp_path / "actions.json")
+    if actions is not None:
+        storage.save_actions(actions, path)
+    store = ActionStore(path, debounce=60)  # no background compaction during the test
+    store.load()
+    return store, path
+
+
+def _write(name):
+    return {"name": name, "type": "write", "param": name}
+
+
+def test_journal_replay_without_compaction(tmp_path):
+    store, path = _store(tmp_path, [_write("a"), _write("b")])
+    store.add(_write("c"))
+    store.move(2, 0)
+    store.update(1, param="A")
+    store.remove(2)
+    # the app "dies" here: nothing was compacted, only the journal has the edits
+    assert [a["name"] for a in load_actions(path)] == ["c", "a"]
+    assert load_actions(path) == store.actions
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    store, path = _store(tmp_path, [_write("a")])
+    store.add(_write("b"))
+    with open(path + storage.JOURNAL_SUFFIX, "a", encoding="utf-8") as fh:
+        fh.write('{"op": "add", "index": 2, "action": {"na')
+    assert [a["name"] for a in load_actions(path)] == ["a", "b"]
+
+
+def test_journal_for_other_main_file_is_ignored(tmp_path):
+    store, path = _store(tmp_path, [_write("a")])
+    store.add(_write("b"))
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump([_write("x")], fh)
+    assert [a["name"] for a in load_actions(path)] == ["x"]
+
+
+def test_flush_compacts_and_restarts_journal(tmp_path):
+    store, path = _store(tmp_path, [_write("a")])
+    store.add(_write("b"))
+    store.flush()
+    with open(path, encoding="utf-8") as fh:
+        assert [a["name"] for a in json.load(fh)] == ["a", "b"]
+    with open(path + storage.JOURNAL_SUFFIX, encoding="utf-8") as fh:
+        assert len(fh.readlines()) == 1  # header only
+    store.close()
+    assert [a["name"] for a in load_actions(path)] == ["a", "b"]
+
+
+def test_crash_after_main_write_keeps_edits_made_during_flush(tmp_path, monkeypatch):
+    store, path = _store(tmp_path, [_write("a")])
+    store.add(_write("b"))
+    real_write = storage._atomic_write
+
+    class Crash(Exception):
+        pass
+
+    def write_then_crash(p, data):
+        if p == path:
+            store.add(_write("during"))  # an edit lands while the main file is being written
+            real_write(p, data)
+            raise Crash()
+        real_write(p, data)
+
+    monkeypatch.setattr(storage, "_atomic_write", write_then_crash)
+    try:
+        store.flush()
+    except Crash:
+        pass
+    assert [a["name"] for a in load_actions(path)] == ["a", "b", "during"]
+
+
+def test_edits_do_not_wait_for_compaction(tmp_path, monkeypatch):
+    store, path = _store(tmp_path, [_write(str(i)) for i in range(5)])
+    store.add(_write("x"))
+    writing = threading.Event()
+    release = threading.Event()
+    real_write = storage._atomic_write
+
+    def slow_write(p, data):
+        if p == path:
+            writing.set()
+            release.wait(5)
+        real_write(p, data)
+
+    monkeypatch.setattr(storage, "_atomic_write", slow_write)
+    t = threading.Thread(target=store.flush)
+    t.start()
+    assert writing.wait(5)
+    moved = threading.Event()
+    threading.Thread(target=lambda: (store.move(0, 1), moved.set())).start()
+    assert moved.wait(1), "move() blocked behind the main file write"
+    release.set()
+    t.join(5)
+    expected = [a["name"] for a in store.actions]
+    store.close()
+    assert [a["name"] for a in load_actions(path)] == expected
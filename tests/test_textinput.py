@@ -0,0 +1,58 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    """Record pyautogui calls made by textinput (without touching the real keyboard)."""
+    calls = []
+    stub = types.ModuleType("pyautogui")
+    stub.write = lambda text, interval=0.0, **kw: calls.append(("write", text, kw))
+    stub.press = lambda key, **kw: calls.append(("press", key))
+    stub.hotkey = lambda *k, **kw: calls.append(("hotkey",) + k)
+    monkeypatch.setitem(sys.modules, "pyautogui", stub)
+    import textinput
+    monkeypatch.setattr(textinput, "pyg", stub)
+    return calls
+
+
+def test_chunked_skips_pyautogui_pause(keys):
+    import textinput
+    assert textinput.enter_text("x" * 40, "chunked", cps=100000.0)
+    writes = [c for c in keys if c[0] == "write"]
+    assert "".join(c[1] for c in writes) == "x" * 40
+    assert all(c[2].get("_pause") is False for c in writes)
+
+
+def test_cancelled_chunked_write_does_not_press_enter(keys, monkeypatch):
+    import mouse
+    from plan import CancelToken, RunCancelled, compile_plan
+
+    token = CancelToken()
+    monkeypatch.setattr(mouse.MouseController.capture, "invalidate", lambda: None)
+    threading.Timer(0.05, token.set).start()
+    plan = compile_plan([{"type": "write", "param": "y" * 64, "input": "chunked", "cps": 100}])
+    with pytest.raises(RunCancelled):
+        plan.run(mouse.MouseController, token)
+    assert ("press", "enter") not in keys
+    assert sum(len(c[1]) for c in keys if c[0] == "write") < 64
+
+
+def test_cancelled_typed_write_stops_between_characters(keys, monkeypatch):
+    import mouse
+    from plan import CancelToken, RunCancelled, compile_plan
+
+    token = CancelToken()
+    monkeypatch.setattr(mouse.MouseController.capture, "invalidate", lambda: None)
+    threading.Timer(0.1, token.set).start()
+    plan = compile_plan([{"type": "write", "param": "z" * 50, "interval": 0.02}])
+    start = time.perf_counter()
+    with pytest.raises(RunCancelled):
+        plan.run(mouse.MouseController, token)
+    assert time.perf_counter() - start < 0.5  # typing all of it would take 1 s
+    assert ("press", "enter") not in keys
+    assert 0 < sum(len(c[1]) for c in keys if c[0] == "write") < 50
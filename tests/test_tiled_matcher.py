@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from capture import SyntheticBackend
+from matcher import SCORE_TIE, TiledMatcher, match_array
+
+
+def make_screen(w, h, seed):
+    """Textured test screen (noise plus flat boxes), like the ones bench.py generates."""
+    import cv2
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+    img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(40):
+        x, y = int(rng.integers(0, w - 20)), int(rng.integers(0, h - 20))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x, y), (x + int(rng.integers(10, 200)), y + int(rng.integers(10, 80))), color, -1)
+    return cv2.add(img, rng.integers(0, 8, img.shape, dtype=np.uint8))
+
+
+def grab(img, origin=(0, 0)):
+    return SyntheticBackend([img], origin=origin).grab()
+
+
+def untiled(frame, hay, needle, confidence):
+    m = match_array(hay, needle, confidence)
+    if m is not None:
+        m.left += frame.left
+        m.top += frame.top
+    return m
+
+
+@pytest.fixture
+def tiled():
+    tm = TiledMatcher(threads=4, min_pixels=0)
+    yield tm
+    tm.shutdown()
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("gray", [False, True])
+def test_tiled_equals_untiled(tiled, seed, gray):
+    rng = np.random.default_rng(100 + seed)
+    screen = make_screen(1280, 800, seed)
+    tw, th = int(rng.integers(16, 120)), int(rng.integers(16, 120))
+    x, y = int(rng.integers(0, 1280 - tw)), int(rng.integers(0, 800 - th))
+    needle_img = screen[y:y + th, x:x + tw].copy()
+    frame = grab(screen, origin=(-1280, 40))
+    hay = frame.gray if gray else frame.image
+    needle = needle_img if not gray else np.ascontiguousarray(frame.gray[y:y + th, x:x + tw])
+    assert tiled.wants(hay, needle)
+    assert len(tiled._tiles(frame, *hay.shape[:2], needle.shape[0])) > 1
+    a = tiled.locate(frame, hay, needle, 0.0)
+    b = untiled(frame, hay, needle, 0.0)
+    assert (a.left, a.top) == (b.left, b.top) == (x - 1280, y + 40)
+    assert a.score == pytest.approx(b.score, abs=SCORE_TIE)
+
+
+def _seams(tiled, frame, nh):
+    # first result row of every band after the first
+    return [t[1] for t in tiled._tiles(frame, frame.size[1], frame.size[0], nh)[1:]]
+
+
+@pytest.mark.parametrize("offset", [-1, 0, 1])
+def test_tie_across_band_seam_goes_to_topmost(tiled, offset):
+    screen = make_screen(1280, 800, 42)
+    patch = make_screen(48, 40, 7)
+    frame = grab(screen)
+    seam = _seams(tiled, frame, patch.shape[0])[0]
+    # identical copies: one just around the seam, one lower down in the next band
+    top_y, low_y = seam + offset, seam + 150
+    screen[top_y:top_y + 40, 600:648] = patch
+    screen[low_y:low_y + 40, 200:248] = patch
+    frame = grab(screen)
+    a = tiled.locate(frame, frame.image, patch, 0.9)
+    b = untiled(frame, frame.image, patch, 0.9)
+    assert (a.left, a.top) == (b.left, b.top) == (600, top_y)
+
+
+def test_tie_on_one_row_goes_to_leftmost(tiled):
+    screen = make_screen(1280, 800, 43)
+    patch = make_screen(48, 40, 8)
+    frame = grab(screen)
+    seam = _seams(tiled, frame, patch.shape[0])[-1]
+    for x in (900, 300, 640):
+        screen[seam:seam + 40, x:x + 48] = patch
+    frame = grab(screen)
+    a = tiled.locate(frame, frame.image, patch, 0.9)
+    b = untiled(frame, frame.image, patch, 0.9)
+    assert (a.left, a.top) == (b.left, b.top) == (300, seam)
+
+
+def test_no_match_below_confidence(tiled):
+    screen = make_screen(1280, 800, 44)
+    frame = grab(screen)
+    needle = np.full((30, 30, 3), 17, np.uint8)
+    needle[::2, ::3] = 250
+    assert tiled.locate(frame, frame.image, needle, 0.99) is None
+    assert untiled(frame, frame.image, needle, 0.99) is None
@@ -0,0 +1,21 @@
+from tracing import RunStats
+
+
+def _stats(values):
+    stats = RunStats(window=len(values))
+    for v in values:
+        stats.add(v)
+    return stats
+
+
+def test_nearest_rank_percentiles():
+    stats = _stats(range(1, 21))
+    assert (stats.percentile(50), stats.percentile(95), stats.percentile(100)) == (10, 19, 20)
+    stats = _stats(range(1, 101))
+    assert (stats.percentile(50), stats.percentile(95), stats.percentile(99)) == (50, 95, 99)
+    assert _stats([3.0]).percentile(0) == 3.0
+    assert RunStats().percentile(50) is None
+
+
+def test_percentile_rank_is_not_pushed_up_by_float_error():
+    assert _stats(range(1, 101)).percentile(7) == 7
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+
+from capture import SyntheticBackend
+from plan import compile_plan
+from triggers import Trigger
+
+
+def _screen(seed, w=640, h=480):
+    """UI-like screen as in bench.make_screen: smooth background, flat labelled boxes, noise."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (h // 40, w // 40, 3), dtype=np.uint8)
+    img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(60):
+        x, y = int(rng.integers(0, w - 20)), int(rng.integers(0, h - 20))
+        bw, bh = int(rng.integers(20, 240)), int(rng.integers(12, 90))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x, y), (x + bw, y + bh), color, -1)
+        cv2.putText(img, "btn%d" % x, (x + 4, y + 14), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+    return cv2.add(img, rng.integers(0, 6, img.shape, dtype=np.uint8))
+
+
+def test_trigger_from_feature_step_does_not_fire_on_unrelated_screens(tmp_path):
+    screen = _screen(1)
+    path = str(tmp_path / "target.png")
+    cv2.imwrite(path, screen[50:200, 50:250])
+    step = compile_plan([{"name": "target", "type": "image", "param": path, "match": "orb"}]).steps[0]
+    # what FloatingButton.arm builds from a plan step; its confidence is a share of keypoints
+    trigger = Trigger(step.name, step.template, lambda t, m: None, confidence=step.confidence,
+                      scales=step.scales, method=step.method, levels=step.levels)
+    for seed in range(2, 12):
+        assert trigger.check(SyntheticBackend([_screen(seed)]).grab()) is None
+    m = trigger.check(SyntheticBackend([screen]).grab())
+    assert m is not None and abs(m.left - 50) <= 3 and abs(m.top - 50) <= 3
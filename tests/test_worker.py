@@ -0,0 +1,118 @@
+import io
+import json
+import threading
+import time
+
+from PySide6.QtCore import Qt
+
+import worker
+from executor import ProcessExecutor
+from worker import WorkerClient
+
+# speaks the worker protocol without running anything; answers a stop only if told to
+FAKE_WORKER = '''
+import json, os, sys
+print(json.dumps({"ev": "ready", "cwd": os.getcwd()}), flush=True)
+for line in sys.stdin:
+    msg = json.loads(line)
+    if msg["op"] == "ping":
+        print(json.dumps({"ev": "pong", "seq": msg["seq"]}), flush=True)
+    elif msg["op"] == "run":
+        print(json.dumps({"ev": "running", "id": msg["id"]}), flush=True)
+    elif msg["op"] == "stop" and os.environ.get("FAKE_WORKER_STOPS"):
+        print(json.dumps({"ev": "done", "id": msg["id"], "state": "cancelled", "error": None}), flush=True)
+    elif msg["op"] == "exit":
+        break
+'''
+
+
+def _fake_worker(tmp_path, monkeypatch, stops):
+    path = tmp_path / "fake_worker.py"
+    path.write_text(FAKE_WORKER)
+    monkeypatch.setattr(worker, "WORKER_PATH", str(path))
+    if stops:
+        monkeypatch.setenv("FAKE_WORKER_STOPS", "1")
+    else:
+        monkeypatch.delenv("FAKE_WORKER_STOPS", raising=False)
+
+
+def _wait(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.02)
+    return cond()
+
+
+def test_worker_runs_in_the_callers_working_directory(tmp_path, monkeypatch):
+    _fake_worker(tmp_path, monkeypatch, stops=True)
+    work = tmp_path / "work"  # not the worker script's directory
+    work.mkdir()
+    monkeypatch.chdir(work)
+    events = []
+    client = WorkerClient(events.append)
+    try:
+        assert _wait(lambda: events)
+        assert events[0]["cwd"] == str(work)
+    finally:
+        client.close()
+
+
+def test_unacknowledged_stop_restarts_the_worker(tmp_path, monkeypatch):
+    _fake_worker(tmp_path, monkeypatch, stops=False)
+    events = []
+    client = WorkerClient(events.append, ping_interval=0.05, hang_timeout=0.3)
+    try:
+        run_id = client.run([])
+        assert _wait(lambda: {"ev": "running", "id": run_id} in events)
+        client.stop(run_id)
+        assert _wait(lambda: any(e["ev"] == "done" for e in events))
+        done = [e for e in events if e["ev"] == "done"]
+        assert done == [{"ev": "done", "id": run_id, "state": "cancelled", "error": None}]
+        assert client.restarts == 1
+    finally:
+        client.close()
+
+
+def test_a_run_keeps_its_id_from_queued_to_cancelled(tmp_path, monkeypatch):
+    _fake_worker(tmp_path, monkeypatch, stops=True)
+    ex = ProcessExecutor(ping_interval=0.05)
+    states = []
+    lock = threading.Lock()
+
+    def record(owner, run_id, state):
+        with lock:
+            states.append((run_id, state))
+
+    ex.state_changed.connect(record, Qt.DirectConnection)
+    try:
+        first = ex.submit("a", {"actions": []})
+        assert _wait(lambda: (first, "running") in states)
+        second = ex.submit("a", {"actions": []}, policy="queue")
+        third = ex.submit("a", {"actions": []}, policy="queue")
+        assert 0 < first < second < third
+        ex.cancel("a")
+        assert _wait(lambda: (first, "cancelled") in states)
+        assert (second, "queued") in states and (second, "cancelled") in states
+        assert (third, "queued") in states and (third, "cancelled") in states
+        assert all(run_id in (first, second, third) for run_id, _ in states)
+    finally:
+        ex.shutdown()
+
+
+def test_looped_run_reports_its_summary_before_done():
+    class Input:
+        # keep the worker reading until the run is done, then exit
+        def __init__(self, out):
+            self.out = out
+
+        def __iter__(self):
+            yield json.dumps({"op": "run", "id": 7, "actions": [], "loop": {"count": 3}})
+            _wait(lambda: '"done"' in self.out.getvalue())
+            yield json.dumps({"op": "exit"})
+
+    out = io.StringIO()
+    worker.serve(Input(out), out)
+    events = [e for e in map(json.loads, out.getvalue().splitlines()) if e.get("id") == 7]
+    assert [e["ev"] for e in events][-2:] == ["loop", "done"]
+    assert sum(e["ev"] == "timed" for e in events) == 3
+    assert events[-2]["summary"].startswith("3 iterations")
@@ -0,0 +1,120 @@
+import sys
+import time
+from typing import Callable, Dict
+
+from lazy import pyautogui as pyg
+
+# how a write action enters its text:
+#   type     - one character at a time with a per-character interval (the original behaviour)
+#   bulk     - pyautogui.write with no interval
+#   paste    - put the text on the clipboard and press Ctrl/Cmd+V (also handles non-ASCII text)
+#   chunked  - zero-interval writes of small chunks, throttled to at most cps characters/second
+INPUT_MODES = ("type", "bulk", "paste", "chunked")
+
+PASTE_KEYS = ("command", "v") if sys.platform == "darwin" else ("ctrl", "v")
+COPY_KEYS = ("command", "c") if sys.platform == "darwin" else ("ctrl", "c")
+SELECT_ALL_KEYS = ("command", "a") if sys.platform == "darwin" else ("ctrl", "a")
+CHUNK_SIZE = 16
+
+
+def _wait(seconds: float, cancel=None) -> bool:
+    """Sleep; returns True if cancel was set meanwhile."""
+    if seconds <= 0:
+        return False
+    if cancel is not None:
+        return cancel.wait(seconds)
+    time.sleep(seconds)
+    return False
+
+
+def _paste(text: str) -> None:
+    import pyperclip
+    try:
+        previous = pyperclip.paste()
+    except Exception:
+        previous = None
+    pyperclip.copy(text)
+    pyg.hotkey(*PASTE_KEYS)
+    if previous is not None:
+        # give the target app time to read the clipboard before restoring it
+        time.sleep(0.05)
+        pyperclip.copy(previous)
+
+
+def _typed(text: str, interval: float, cancel=None) -> bool:
+    """Type text one character at a time, like pyautogui.write(text, interval), but stoppable.
+
+    Returns False if cancel was set before all of text was sent.
+    """
+    for ch in text:
+        pyg.write(ch, interval=0, _pause=False)
+        if _wait(interval, cancel):
+            return False
+    return True
+
+
+def _chunked(text: str, cps: float, cancel=None) -> bool:
+    """Returns False if cancel was set before all of text was sent."""
+    start = time.perf_counter()
+    sent = 0
+    for i in range(0, len(text), CHUNK_SIZE):
+        chunk = text[i:i + CHUNK_SIZE]
+        # no pyautogui.PAUSE after each chunk: the pacing below is the only throttle
+        pyg.write(chunk, interval=0, _pause=False)
+        sent += len(chunk)
+        # schedule against the start time so rounding doesn't accumulate
+        ahead = sent / cps - (time.perf_counter() - start)
+        if _wait(ahead, cancel):
+            return False
+    return True
+
+
+def verify_by_copy(text: str) -> bool:
+    """Select all in the focused field, copy it and compare with text. Restores the clipboard."""
+    import pyperclip
+    try:
+        previous = pyperclip.paste()
+    except Exception:
+        previous = None
+    pyg.hotkey(*SELECT_ALL_KEYS)
+    pyg.hotkey(*COPY_KEYS)
+    time.sleep(0.05)
+    ok = pyperclip.paste() == text
+    pyg.press("end")
+    if previous is not None:
+        pyperclip.copy(previous)
+    return ok
+
+
+# name -> fn(text) -> bool; called after the text is entered, before Enter is pressed
+VERIFIERS: Dict[str, Callable[[str], bool]] = {
+    "copy": verify_by_copy,
+}
+
+
+def register_verifier(name: str, fn: Callable[[str], bool]) -> None:
+    """Make a verification hook available to write actions as "verify": name."""
+    VERIFIERS[name] = fn
+
+
+def enter_text(text: str, mode: str = "type", interval: float = 0.2, cps: float = 200.0,
+               verify: str | None = None, cancel=None) -> bool:
+    """Enter text with the given mode. Returns the verification result (True without a verifier).
+
+    Returns False without verifying if cancel was set before all of the text was entered.
+    """
+    if mode == "type":
+        if not _typed(text, interval, cancel):
+            return False
+    elif mode == "bulk":
+        pyg.write(text, interval=0)
+    elif mode == "paste":
+        _paste(text)
+    elif mode == "chunked":
+        if not _chunked(text, cps, cancel):
+            return False
+    else:
+        raise ValueError(f"Unknown input mode: {mode}")
+    if verify:
+        return VERIFIERS[verify](text)
+    return True
@@ -0,0 +1,196 @@
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Set
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QImage, QPixmap
+
+from bundle import file_sha1
+from lazy import cv2, np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache", "thumbs")
+THUMB_SIZE = 32
+
+
+def _reduced_flag(path: str, size: int) -> int:
+    # let libjpeg decode at 1/2, 1/4 or 1/8 size instead of full resolution when possible
+    if not path.lower().endswith((".jpg", ".jpeg")):
+        return cv2.IMREAD_COLOR
+    try:
+        with open(path, "rb") as fh:
+            data = fh.read(64 * 1024)
+        i = 2
+        while i + 9 < len(data):
+            marker, length = data[i + 1], struct.unpack(">H", data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xC3:
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                    if min(w, h) // factor >= size:
+                        return flag
+                break
+            i += 2 + length
+    except (OSError, ValueError, IndexError):
+        pass
+    return cv2.IMREAD_COLOR
+
+
+def render_thumbnail(path: str, size: int = THUMB_SIZE) -> bytes:
+    """PNG bytes of the image at path scaled to fit a size x size square."""
+    buf = np.fromfile(path, dtype=np.uint8)
+    img = cv2.imdecode(buf, _reduced_flag(path, size))
+    if img is None:
+        raise ValueError(f"Could not decode image: {path}")
+    h, w = img.shape[:2]
+    scale = size / max(h, w)
+    if scale < 1.0:
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    ok, png = cv2.imencode(".png", img)
+    if not ok:
+        raise ValueError(f"Could not encode thumbnail: {path}")
+    return png.tobytes()
+
+
+class ThumbnailDiskCache:
+    """Thumbnail PNGs on disk, keyed by the source image's content hash and thumbnail size.
+
+    Renamed or copied images reuse the same entry; an edited image gets a new one. Reads touch
+    the file's mtime, and when the directory grows past max_bytes the least recently used
+    entries are deleted.
+    """
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 16 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes: int | None = None  # total size, measured on first write
+        self.evictions = 0
+
+    def _path(self, digest: str, size: int) -> str:
+        return os.path.join(self.directory, f"{digest}_{size}.png")
+
+    def get(self, digest: str, size: int) -> bytes | None:
+        p = self._path(digest, size)
+        try:
+            with open(p, "rb") as fh:
+                data = fh.read()
+            os.utime(p)
+            return data
+        except OSError:
+            return None
+
+    def put(self, digest: str, size: int, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        p = self._path(digest, size)
+        tmp = f"{p}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, p)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_bytes()
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                stats = [(e.stat(), e.path) for e in it if e.name.endswith(".png")]
+        except OSError:
+            return []
+        return [(st.st_mtime, st.st_size, path) for st, path in stats]
+
+    def _scan_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        # caller holds self._lock; shrink to 3/4 of the budget so evictions come in batches
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 3 // 4
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+
+class ThumbnailLoader(QObject):
+    """Produces image thumbnails on a small thread pool, never on the calling (GUI) thread.
+
+    get(path) returns a cached QPixmap, or None after queueing the thumbnail; `ready` is
+    emitted with the path once it can be fetched with get(). Worker threads only build
+    QImages; QPixmaps are created on the GUI thread when a queued `ready` arrives.
+    """
+    # (image path) when its thumbnail became available (or failed; get() then keeps returning None)
+    ready = Signal(str)
+
+    def __init__(self, size: int = THUMB_SIZE, max_workers: int = 2, disk: ThumbnailDiskCache | None = None,
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self.size = size
+        self.disk = disk if disk is not None else ThumbnailDiskCache()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbs")
+        self._lock = threading.Lock()
+        self._images: Dict[str, QImage] = {}
+        self._pixmaps: Dict[str, QPixmap] = {}
+        self._pending: Set[str] = set()
+        self._failed: Set[str] = set()
+        self.disk_hits = 0
+        self.rendered = 0
+
+    def get(self, path: str) -> QPixmap | None:
+        pm = self._pixmaps.get(path)
+        if pm is not None:
+            return pm
+        with self._lock:
+            img = self._images.pop(path, None)
+            if img is None:
+                if path not in self._pending and path not in self._failed:
+                    self._pending.add(path)
+                    self._pool.submit(self._load, path)
+                return None
+        pm = self._pixmaps[path] = QPixmap.fromImage(img)
+        return pm
+
+    def invalidate(self, path: str) -> None:
+        """Forget a thumbnail (e.g. after the image file changed); the next get() reloads it."""
+        self._pixmaps.pop(path, None)
+        with self._lock:
+            self._images.pop(path, None)
+            self._failed.discard(path)
+
+    def _load(self, path: str) -> None:
+        img = None
+        try:
+            digest = file_sha1(path)
+            data = self.disk.get(digest, self.size)
+            if data is None:
+                data = render_thumbnail(path, self.size)
+                self.disk.put(digest, self.size, data)
+                self.rendered += 1
+            else:
+                self.disk_hits += 1
+            img = QImage.fromData(data, "PNG")
+            if img.isNull():
+                img = None
+        except Exception as e:
+            print(f"Thumbnail failed for {path}: {e}")
+        with self._lock:
+            self._pending.discard(path)
+            if img is None:
+                self._failed.add(path)
+            else:
+                self._images[path] = img
+        self.ready.emit(path)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
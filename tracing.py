@@ -0,0 +1,126 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+DEFAULT_TRACE_PATH = os.path.join(os.path.dirname(__file__), "logs", "trace.jsonl")
+
+
+class ActionTrace:
+    """Timings (seconds) of one executed action."""
+    __slots__ = ("run_id", "index", "name", "type", "ts", "capture", "match", "input", "pacing",
+                 "total", "skipped", "found", "score", "location", "error")
+
+    def __init__(self, run_id: int, index: int, name: str, a_type: str):
+        self.run_id = run_id
+        self.index = index
+        self.name = name
+        self.type = a_type
+        self.ts = time.time()
+        self.capture = 0.0
+        self.match = 0.0
+        self.input = 0.0
+        self.pacing = 0.0
+        self.total = 0.0
+        # match attempts answered by the change check without matching
+        self.skipped = 0
+        self.found = None
+        self.score = None
+        self.location = None
+        self.error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "run": self.run_id,
+            "index": self.index,
+            "name": self.name,
+            "type": self.type,
+            "ts": round(self.ts, 3),
+            "capture_ms": round(self.capture * 1000, 3),
+            "match_ms": round(self.match * 1000, 3),
+            "input_ms": round(self.input * 1000, 3),
+            "pacing_ms": round(self.pacing * 1000, 3),
+            "total_ms": round(self.total * 1000, 3),
+        }
+        if self.skipped:
+            d["skipped"] = self.skipped
+        if self.found is not None:
+            d["found"] = self.found
+        if self.score is not None:
+            d["score"] = round(self.score, 4)
+        if self.location is not None:
+            d["location"] = list(self.location)
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class TraceWriter:
+    """Append traces as JSON lines, rotating the file when it grows past max_bytes.
+
+    Rotated files are kept as trace.jsonl.1 ... trace.jsonl.<backups>.
+    """
+    def __init__(self, path: str = DEFAULT_TRACE_PATH, max_bytes: int = 5 * 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            try:
+                d = os.path.dirname(self.path)
+                if d and not os.path.exists(d):
+                    os.makedirs(d, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    fh.write(data)
+            except OSError as e:
+                print("Could not write trace:", e)
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class RunStats:
+    """Durations of the most recent runs, for the live display on a floating button."""
+    def __init__(self, window: int = 100):
+        self._runs: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._runs.append(seconds)
+
+    @property
+    def last(self) -> float | None:
+        with self._lock:
+            return self._runs[-1] if self._runs else None
+
+    def percentile(self, p: float) -> float | None:
+        """Nearest-rank percentile of the recorded durations."""
+        with self._lock:
+            data = sorted(self._runs)
+        if not data:
+            return None
+        # p * n first: p / 100 * n can land just above an integer (0.07 * 100) and round up a rank
+        k = max(0, min(len(data) - 1, math.ceil(p * len(data) / 100.0) - 1))
+        return data[k]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._runs)
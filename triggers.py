@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from capture import SharedCapture, shared_capture
+from lazy import np
+from matcher import Match, lookup, match_memo
+from templates import Template
+
+
+class Trigger:
+    """Fires callback(trigger, match) when its template appears on screen.
+
+    Edge triggered: it fires once when the template shows up and again only after it has
+    disappeared and reappeared, at most once per cooldown seconds. method is a match method as
+    for image actions; confidence is on that method's scale (a share of keypoints for 'orb' and
+    'akaze').
+    """
+    __slots__ = ("name", "template", "callback", "confidence", "grayscale", "scales", "cooldown",
+                 "memo", "method", "levels", "hint", "present", "fired", "_last_fire")
+
+    def __init__(self, name: str, template: Template, callback: Callable[["Trigger", Match], None],
+                 confidence: float = 0.8, grayscale: bool = False, scales: Sequence[float] | None = None,
+                 cooldown: float = 0.5, memo: bool = False, method: str = "template", levels: int = 2):
+        self.name = name
+        self.template = template
+        self.callback = callback
+        self.confidence = confidence
+        self.method = method
+        self.levels = levels
+        self.grayscale = grayscale
+        self.scales = scales
+        self.cooldown = cooldown
+        self.memo = memo
+        self.hint = None
+        self.present = False
+        self.fired = 0
+        self._last_fire = 0.0
+
+    def check(self, frame) -> Match | None:
+        """Match the template on frame, remembering where it was for the next check.
+
+        With memo, goes through matcher.match_memo, so a trigger whose area of the screen didn't
+        visibly change (while something else did) is not matched again.
+        """
+        if self.memo:
+            m, _ = match_memo.locate(self.template, frame, self.hint, self.confidence, self.grayscale,
+                                     self.method, self.levels, self.scales)
+        else:
+            m = lookup(self.template, frame, self.hint, self.confidence, self.grayscale, self.method,
+                       self.levels, self.scales)
+        if m is not None:
+            self.hint = [m.left, m.top, m.scale] if self.scales else [m.left, m.top]
+        return m
+
+
+class TriggerLoop:
+    """One capture loop that serves every armed trigger.
+
+    Each tick takes one capture and, if any pixel changed since the previous tick, checks all
+    triggers against it; on an identical screen only newly armed triggers are checked. Ticks
+    run at most max_fps times per second. The loop thread starts with the first armed trigger
+    and ends when the last one is disarmed. Callbacks run on the loop thread and should return
+    quickly (e.g. emit a Qt signal or submit a run).
+    """
+    def __init__(self, capture: SharedCapture = shared_capture, max_fps: float = 5.0):
+        self.capture = capture
+        self.max_fps = max_fps
+        self._triggers: List[Trigger] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.ticks = 0
+        self.skipped = 0
+        self.checks = 0
+        self.errors = 0
+
+    def arm(self, trigger: Trigger) -> Trigger:
+        with self._lock:
+            self._triggers.append(trigger)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._loop, args=(self._stop,), name="triggers",
+                                                daemon=True)
+                self._thread.start()
+        return trigger
+
+    def disarm(self, trigger: Trigger) -> None:
+        with self._lock:
+            if trigger in self._triggers:
+                self._triggers.remove(trigger)
+            if not self._triggers:
+                self._stop.set()
+                self._thread = None
+
+    def triggers(self) -> List[Trigger]:
+        with self._lock:
+            return list(self._triggers)
+
+    def stop(self) -> None:
+        """Disarm everything and end the loop thread."""
+        with self._lock:
+            self._triggers.clear()
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    def _loop(self, stop: threading.Event) -> None:
+        prev = None
+        checked = set()  # triggers already matched against the current screen contents
+        next_tick = time.perf_counter()
+        while not stop.is_set():
+            try:
+                frame = self.capture.refresh()
+                self.ticks += 1
+                # exact comparison: a faint change can be exactly the image a trigger waits for
+                if prev is None or prev.shape != frame.image.shape or not np.array_equal(prev, frame.image):
+                    checked.clear()
+                prev = frame.image
+                due = [t for t in self.triggers() if t not in checked]
+                if not due:
+                    self.skipped += 1
+                for t in due:
+                    self._check(t, frame)
+                    checked.add(t)
+            except Exception as e:
+                self.errors += 1
+                print("Trigger loop error:", e)
+            # bounded frame rate, scheduled against the previous tick so it doesn't drift
+            next_tick = max(next_tick + 1.0 / self.max_fps, time.perf_counter())
+            stop.wait(next_tick - time.perf_counter())
+
+    def _check(self, t: Trigger, frame) -> None:
+        self.checks += 1
+        m = t.check(frame)
+        if m is None:
+            t.present = False
+            return
+        if t.present:
+            return
+        t.present = True
+        now = time.monotonic()
+        if now - t._last_fire < t.cooldown:
+            return
+        t._last_fire = now
+        t.fired += 1
+        try:
+            t.callback(t, m)
+        except Exception as e:
+            print(f"Trigger {t.name} callback error:", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "triggers": len(self.triggers()),
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "checks": self.checks,
+            "errors": self.errors,
+            "max_fps": self.max_fps,
+        }
+
+
+# shared by all floating buttons (and the headless runner)
+trigger_loop = TriggerLoop()
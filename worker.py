@@ -0,0 +1,295 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+# JSON lines over the worker's stdin/stdout, one object per line.
+#
+# parent -> worker
+#   {"op": "run", "id": n, "actions": [...], "motion": name|null, "loop": {count, duration, rate}|null,
+#    "trace": bool}
+#   {"op": "stop", "id": n}        cancel a run (no-op if it already ended)
+#   {"op": "ping", "seq": n}
+#   {"op": "exit"}
+#
+# worker -> parent
+#   {"ev": "ready"}
+#   {"ev": "running", "id": n}
+#   {"ev": "step", "id": n, "index": i, "name": str}             progress, as each step starts
+#   {"ev": "hit", "id": n, "index": i, "hit": [left, top(, scale)]}
+#   {"ev": "timed", "id": n, "seconds": s}                       after each completed pass
+#   {"ev": "loop", "id": n, "summary": str}                      when a looped run ends (loop.LoopStats)
+#   {"ev": "traces", "id": n, "records": [...]}                  tracing.ActionTrace.to_dict() records
+#   {"ev": "done", "id": n, "state": "done"|"cancelled"|"error", "error": str|null}
+#   {"ev": "pong", "seq": n}
+#
+# A run's last event is always "done"; the client reports "done" itself for runs that were active
+# when the worker crashed, hung or did not acknowledge a stop (state "cancelled" for those being
+# stopped, else "error"). Run ids are chosen by the parent.
+#
+# The worker is started as `worker.py [bundle]`; with a template bundle path (bundle.bundle_path)
+# it serves templates from that bundle, re-attaching it whenever the bundle is rewritten.
+
+WORKER_PATH = os.path.abspath(__file__)
+
+
+def _plan_key(actions: List[Dict[str, Any]]) -> str:
+    # last_hit changes as runs find images; the compiled plan keeps its own hits
+    return json.dumps([{k: v for k, v in a.items() if k != "last_hit"} for a in actions], sort_keys=True)
+
+
+def serve(inp=None, out=None, bundle: str | None = None) -> int:
+    """Worker process main loop: read requests from inp, write events to out."""
+    from bundle import TemplateBundle
+    from loop import LoopSpec, LoopStats, run_loop
+    from motion import get_profile
+    from mouse import MouseController
+    from plan import CancelToken, RunCancelled, compile_plan
+    from templates import template_cache
+
+    send_lock = threading.Lock()
+    tokens: Dict[int, CancelToken] = {}
+    plans: Dict[str, Any] = {}  # compiled plans stay loaded (templates, hits) across runs
+    bundle_lock = threading.Lock()
+    bundle_key = None
+
+    def attach_bundle() -> None:
+        nonlocal bundle_key
+        # a save replaces the bundle's pointer file, so its stat changes
+        try:
+            st = os.stat(bundle)
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        with bundle_lock:
+            if key != bundle_key:
+                bundle_key = key
+                template_cache.use_bundle(TemplateBundle.open(bundle) if key else None)
+
+    def send(msg: Dict[str, Any]) -> None:
+        line = json.dumps(msg) + "\n"
+        with send_lock:
+            out.write(line)
+            out.flush()
+
+    def run(msg: Dict[str, Any]) -> None:
+        run_id = msg["id"]
+        token = tokens[run_id]
+        state, error = "done", None
+        try:
+            if bundle:
+                attach_bundle()
+            key = _plan_key(msg["actions"])
+            plan = plans.get(key)
+            if plan is None:
+                plan = plans[key] = compile_plan(msg["actions"])
+            motion = get_profile(msg.get("motion"))
+            send({"ev": "running", "id": run_id})
+
+            def once(_i: int = 0) -> None:
+                traces = [] if msg.get("trace") else None
+                t0 = time.perf_counter()
+                try:
+                    plan.run(MouseController, token, motion=motion, traces=traces, run_id=run_id,
+                             on_hit=lambda i, hit: send({"ev": "hit", "id": run_id, "index": i, "hit": hit}),
+                             on_step=lambda i, name: send({"ev": "step", "id": run_id, "index": i, "name": name}))
+                    send({"ev": "timed", "id": run_id, "seconds": time.perf_counter() - t0})
+                finally:
+                    if traces:
+                        send({"ev": "traces", "id": run_id, "records": [t.to_dict() for t in traces]})
+
+            if msg.get("loop"):
+                stats = LoopStats()
+                try:
+                    run_loop(once, LoopSpec(**msg["loop"]), token, stats=stats)
+                finally:
+                    send({"ev": "loop", "id": run_id, "summary": stats.summary()})
+            else:
+                once()
+            if token.is_set():
+                state = "cancelled"
+        except RunCancelled:
+            state = "cancelled"
+        except Exception as e:
+            state, error = "error", str(e)
+        finally:
+            tokens.pop(run_id, None)
+            send({"ev": "done", "id": run_id, "state": state, "error": error})
+
+    send({"ev": "ready"})
+    for line in inp:
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        op = msg.get("op")
+        if op == "run":
+            tokens[msg["id"]] = CancelToken()
+            threading.Thread(target=run, args=(msg,), name=f"run-{msg['id']}", daemon=True).start()
+        elif op == "stop":
+            token = tokens.get(msg.get("id"))
+            if token is not None:
+                token.set()
+        elif op == "ping":
+            send({"ev": "pong", "seq": msg.get("seq")})
+        elif op == "exit":
+            break
+    for token in list(tokens.values()):
+        token.set()
+    return 0
+
+
+class WorkerClient:
+    """Runs action sequences in a separate worker process (see the protocol above).
+
+    Events from the worker are passed to on_event(msg) on a reader thread. A watchdog pings
+    the worker every ping_interval seconds; if it exits, answers nothing for hang_timeout
+    seconds, or leaves a stop unacknowledged (no "done") for hang_timeout seconds, it is killed
+    and restarted. Its active runs then end with state "error" ("cancelled" if being stopped).
+    bundle is the template bundle path the worker serves templates from.
+    """
+    def __init__(self, on_event: Callable[[Dict[str, Any]], None], ping_interval: float = 1.0,
+                 hang_timeout: float = 10.0, bundle: str | None = None):
+        self.on_event = on_event
+        self.ping_interval = ping_interval
+        self.hang_timeout = hang_timeout
+        self.bundle = bundle
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen | None = None
+        self._active: set = set()
+        self._stopping: Dict[int, float] = {}  # run id -> when its stop was sent
+        self._last_seen = 0.0
+        self._closed = False
+        self._spawn()
+        threading.Thread(target=self._watchdog, name="worker-watchdog", daemon=True).start()
+
+    def _spawn(self) -> None:
+        # caller holds self._lock, or is __init__
+        proc = subprocess.Popen(
+            [sys.executable, "-u", WORKER_PATH] + ([self.bundle] if self.bundle else []),
+            # same working directory as this process, so relative image, bundle and trace paths
+            # in actions resolve to the same files (the script's directory is on sys.path anyway)
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding="utf-8",
+        )
+        self._proc = proc
+        self._last_seen = time.monotonic()
+        threading.Thread(target=self._reader, args=(proc,), name="worker-reader", daemon=True).start()
+
+    def _send(self, msg: Dict[str, Any]) -> bool:
+        with self._lock:
+            proc = self._proc
+            if proc is None or self._closed:
+                return False
+            try:
+                proc.stdin.write(json.dumps(msg) + "\n")
+                proc.stdin.flush()
+                return True
+            except (OSError, ValueError):
+                return False
+
+    def _reader(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                if proc is not self._proc:
+                    return  # replaced by a restart
+                self._last_seen = time.monotonic()
+                if msg.get("ev") == "done":
+                    self._active.discard(msg.get("id"))
+                    self._stopping.pop(msg.get("id"), None)
+            if msg.get("ev") != "pong":
+                self.on_event(msg)
+
+    def _watchdog(self) -> None:
+        while not self._closed:
+            time.sleep(self.ping_interval)
+            with self._lock:
+                proc = self._proc
+                now = time.monotonic()
+                silent = now - self._last_seen
+                stuck = min(self._stopping.items(), key=lambda item: item[1], default=None)
+            if self._closed:
+                return
+            if proc.poll() is not None:
+                self._restart(f"worker exited with code {proc.returncode}")
+            elif silent > self.hang_timeout:
+                self._restart(f"worker not responding for {silent:.0f}s")
+            elif stuck is not None and now - stuck[1] > self.hang_timeout:
+                self._restart(f"run {stuck[0]} did not stop within {self.hang_timeout:g}s")
+            else:
+                self._send({"op": "ping", "seq": next(self._seq)})
+
+    def _restart(self, reason: str) -> None:
+        print(f"Restarting action worker: {reason}")
+        with self._lock:
+            if self._closed:
+                return
+            old, lost = self._proc, sorted(self._active)
+            stopping = set(self._stopping)
+            self._active.clear()
+            self._stopping.clear()
+            self.restarts += 1
+            self._spawn()
+        try:
+            old.kill()
+        except OSError:
+            pass
+        for run_id in lost:
+            if run_id in stopping:
+                self.on_event({"ev": "done", "id": run_id, "state": "cancelled", "error": None})
+            else:
+                self.on_event({"ev": "done", "id": run_id, "state": "error", "error": reason})
+
+    def run(self, actions: List[Dict[str, Any]], motion: str | None = None, loop: Dict[str, Any] | None = None,
+            trace: bool = False, run_id: int | None = None) -> int | None:
+        """Start a sequence in the worker. Returns its run id, or None if the worker is closed.
+
+        run_id lets the caller keep the id it already gave the run (e.g. while it was queued).
+        """
+        if run_id is None:
+            run_id = next(self._ids)
+        with self._lock:
+            self._active.add(run_id)
+        if not self._send({"op": "run", "id": run_id, "actions": actions, "motion": motion, "loop": loop,
+                           "trace": trace}):
+            with self._lock:
+                self._active.discard(run_id)
+            return None
+        return run_id
+
+    def stop(self, run_id: int) -> None:
+        with self._lock:
+            if run_id in self._active:
+                self._stopping.setdefault(run_id, time.monotonic())
+        self._send({"op": "stop", "id": run_id})
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Stop all runs and end the worker process."""
+        self._send({"op": "exit"})
+        with self._lock:
+            self._closed = True
+            proc = self._proc
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            proc.kill()
+
+
+if __name__ == "__main__":
+    # keep stdout for the protocol; anything printed by actions goes to stderr
+    _out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.exit(serve(sys.stdin, _out, sys.argv[1] if len(sys.argv) > 1 else None))